@@ -1,2 +1,6 @@
 from .placeholders import Placeholders
-from .settings import Settings, TOKENS
\ No newline at end of file
+from .settings import Settings, TOKENS
+from .write_buffer import WriteBuffer
+from .cache import DocumentCache
+from .change_watcher import ChangeWatcher
+from .readonly import ReadOnlyDict, ReadOnlyList, readonly, unwrap
\ No newline at end of file
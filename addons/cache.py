@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value: dict, expires_at: float) -> None:
+        self.value: dict = value
+        self.expires_at: float = expires_at
+
+class DocumentCache:
+    """A bounded LRU cache of database documents.
+       Entries are fresh for ttl seconds. After that, they are still served for up to
+       max_stale seconds while a background refresh reloads them. Refreshes update the
+       cached dict in place, so references handed out before stay current.
+       Concurrent misses of the same key share a single load.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600, max_stale: float = 3600) -> None:
+        self._data: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._max_size: int = max_size
+        self._ttl: float = ttl
+        self._max_stale: float = max_stale
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits: int = 0
+        self.stale_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.refreshes: int = 0
+        self.refresh_errors: int = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached document, fresh or not, without loading it."""
+        entry = self._data.get(key)
+        return default if entry is None else entry.value
+
+    def put(self, key: Hashable, value: dict) -> dict:
+        self._data[key] = CacheEntry(value, time.monotonic() + self._ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def patch(self, key: Hashable, value: dict) -> bool:
+        """Replaces the content of a cached document in place and marks it fresh.
+           Returns False when the key is not cached.
+        """
+        if (entry := self._data.get(key)) is None:
+            return False
+
+        entry.value.clear()
+        entry.value.update(value)
+        entry.expires_at = time.monotonic() + self._ttl
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry.value
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def fetch(self, key: Hashable, loader: Callable[[Hashable], Awaitable[dict]]) -> dict:
+        """Returns the cached document, using loader to load it on a miss or to refresh it once stale."""
+        now = time.monotonic()
+        if (entry := self._data.get(key)) is not None and now < entry.expires_at + self._max_stale:
+            self._data.move_to_end(key)
+            if now < entry.expires_at:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._load(key, loader)
+            return entry.value
+
+        self.misses += 1
+        return await asyncio.shield(self._load(key, loader))
+
+    def _load(self, key: Hashable, loader: Callable[[Hashable], Awaitable[dict]]) -> asyncio.Future:
+        if (future := self._loading.get(key)) is None:
+            future = self._loading[key] = asyncio.ensure_future(self._run_loader(key, loader))
+            future.add_done_callback(lambda f: self._loaded(key, f))
+        return future
+
+    async def _run_loader(self, key: Hashable, loader: Callable[[Hashable], Awaitable[dict]]) -> dict:
+        value = await loader(key)
+        if not self.patch(key, value):
+            return self.put(key, value)
+
+        self.refreshes += 1
+        return self._data[key].value
+
+    def _loaded(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._loading.get(key) is future:
+            del self._loading[key]
+
+        if not future.cancelled() and future.exception() and key in self._data:
+            self.refresh_errors += 1
+
+    def purge(self) -> int:
+        """Drops the entries that are too old to be served anymore, returns how many were dropped."""
+        now = time.monotonic()
+        expired = [key for key, entry in self._data.items() if now >= entry.expires_at + self._max_stale]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "hit_rate": round(self.hit_rate, 4)
+        }
@@ -0,0 +1,116 @@
+import asyncio
+
+from typing import Any, Callable, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .cache import DocumentCache
+from .write_buffer import WriteBuffer
+
+# Error codes MongoDB answers with when change streams are not available, e.g. on a standalone server.
+CHANGE_STREAM_UNSUPPORTED = (40573, 40324)
+
+RETRY_DELAY = 5.0
+
+# Events about the whole collection, every cached document is dropped.
+COLLECTION_EVENTS = ("drop", "rename", "dropDatabase", "invalidate")
+
+class ChangeWatcher:
+    """Keeps a DocumentCache in sync with the changes made to a collection by other processes.
+       Cached documents are patched in place from the change stream, with the updates of this
+       process that are not written yet applied on top. The watcher stops itself when the
+       server does not support change streams, which requires a replica set.
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        cache: DocumentCache,
+        *,
+        write_buffer: Optional[WriteBuffer] = None,
+        apply_update: Optional[Callable[[dict, dict], bool]] = None
+    ) -> None:
+        self._collection = collection
+        self._cache: DocumentCache = cache
+        self._write_buffer: Optional[WriteBuffer] = write_buffer
+        self._apply_update: Optional[Callable[[dict, dict], bool]] = apply_update
+
+        self._resume_token: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enabled: bool = True
+        self.patched: int = 0
+        self.dropped: int = 0
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+        return self._task
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self) -> None:
+        while self.enabled:
+            try:
+                async with self._collection.watch(full_document="updateLookup", resume_after=self._resume_token) as stream:
+                    async for change in stream:
+                        self.handle(change)
+                        self._resume_token = stream.resume_token
+
+                        if change["operationType"] in COLLECTION_EVENTS:
+                            # The stream is invalidated, a new one is opened from now.
+                            self._resume_token = None
+                            break
+
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    self.enabled = False
+                    print(f"Change streams are not supported by the database, {self._collection.name} is not watched.")
+                    return
+
+                # The resume token may have fallen off the oplog, start over from now.
+                self._resume_token = None
+                await asyncio.sleep(RETRY_DELAY)
+
+            except PyMongoError:
+                await asyncio.sleep(RETRY_DELAY)
+
+    def handle(self, change: dict) -> None:
+        """Applies a single change stream event to the cache."""
+        if change["operationType"] in COLLECTION_EVENTS:
+            self.dropped += len(self._cache)
+            self._cache.clear()
+            return
+
+        if (key := change.get("documentKey", {}).get("_id")) is None or key not in self._cache:
+            return
+
+        if change["operationType"] == "delete":
+            self._cache.pop(key)
+            self.dropped += 1
+            return
+
+        if (document := change.get("fullDocument")) is None:
+            return
+
+        filter = {"_id": key}
+        if self._write_buffer:
+            # Updates being written will show up in a later event with the full document.
+            if self._write_buffer.is_flushing(self._collection, filter):
+                return
+
+            if self._apply_update:
+                for update in self._write_buffer.pending_updates(self._collection, filter):
+                    self._apply_update(document, update)
+
+        self._cache.patch(key, document)
+        self.patched += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "patched": self.patched,
+            "dropped": self.dropped
+        }
@@ -0,0 +1,84 @@
+import copy
+
+from typing import Any, Iterator, Mapping, Sequence, Union
+
+def readonly(value: Any) -> Any:
+    """Wraps dicts and lists into read-only views, other values are returned as they are."""
+    if isinstance(value, dict):
+        return ReadOnlyDict(value)
+    if isinstance(value, list):
+        return ReadOnlyList(value)
+    return value
+
+def unwrap(value: Any) -> Any:
+    """Returns value with every read-only view in it replaced by a mutable deep copy,
+       so it can be stored or BSON encoded. Dicts and lists are copied along the way.
+    """
+    if isinstance(value, (ReadOnlyDict, ReadOnlyList)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: unwrap(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [unwrap(item) for item in value]
+    return value
+
+class ReadOnlyDict(Mapping):
+    """A read-only view of a dict, nested dicts and lists are wrapped when read.
+       Nothing is copied, the view always shows the current content of the dict.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict) -> None:
+        self._data: dict = data
+
+    def __getitem__(self, key: Any) -> Any:
+        return readonly(self._data[key])
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._data
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyDict({self._data!r})"
+
+    def copy(self) -> dict:
+        """Returns a mutable deep copy of the dict."""
+        return copy.deepcopy(self._data)
+
+class ReadOnlyList(Sequence):
+    """A read-only view of a list, nested dicts and lists are wrapped when read."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: list) -> None:
+        self._data: list = data
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return ReadOnlyList(self._data[index])
+        return readonly(self._data[index])
+
+    def __iter__(self) -> Iterator:
+        return map(readonly, self._data)
+
+    def __reversed__(self) -> Iterator:
+        return map(readonly, reversed(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self._data
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyList({self._data!r})"
+
+    def copy(self) -> list:
+        """Returns a mutable deep copy of the list."""
+        return copy.deepcopy(self._data)
@@ -17,6 +17,7 @@ class Settings:
         self.lyrics_platform: str = settings.get("lyrics_platform", "A_ZLyrics").lower()
         self.ipc_server: dict = settings.get("ipc_server", {})
         self.version: str = settings.get("version", "")
+        self.change_streams: bool = settings.get("change_streams", False)
 
 class TOKENS:
     def __init__(self) -> None:
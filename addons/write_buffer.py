@@ -0,0 +1,291 @@
+import asyncio
+import copy
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Pending writes are flushed every FLUSH_INTERVAL seconds, or as soon as FLUSH_SIZE operations are waiting.
+FLUSH_INTERVAL = 5.0
+FLUSH_SIZE = 500
+
+# Operators whose updates of the same field can be merged into one.
+MERGEABLE_OPERATORS = ("$set", "$unset", "$inc", "$push", "$pull")
+
+def _overlaps(path: str, other: str) -> bool:
+    """Whether two dotted field paths are the same field or one contains the other."""
+    return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+
+def _push_items(value: Any) -> Optional[Tuple[list, Optional[int]]]:
+    if isinstance(value, dict) and "$each" in value:
+        if not value.keys() <= {"$each", "$slice"}:
+            return None
+        return list(value["$each"]), value.get("$slice")
+    return [value], None
+
+def _pull_items(value: Any) -> Optional[list]:
+    if isinstance(value, dict):
+        return list(value["$in"]) if value.keys() == {"$in"} else None
+    return [value]
+
+def _merge_field(operator: str, old: Any, new: Any) -> Tuple[bool, Any]:
+    """Merges two updates of the same field by the same operator.
+       Returns whether they could be merged and the merged value.
+    """
+    if operator in ("$set", "$unset"):
+        return True, new
+
+    if operator == "$inc":
+        return True, old + new
+
+    if operator == "$push":
+        if (old_push := _push_items(old)) is None or (new_push := _push_items(new)) is None:
+            return False, None
+
+        (old_items, old_slice), (new_items, new_slice) = old_push, new_push
+        if old_slice is None and new_slice is None:
+            return True, {"$each": old_items + new_items}
+
+        # Keeping the last n items twice is the same as keeping them once, if the second n is not larger.
+        if old_slice is not None and new_slice is not None and new_slice <= 0 and old_slice <= new_slice:
+            return True, {"$each": old_items + new_items, "$slice": new_slice}
+
+        return False, None
+
+    if operator == "$pull":
+        old_items, new_items = _pull_items(old), _pull_items(new)
+        if old_items is None or new_items is None:
+            return False, None
+        return True, {"$in": old_items + new_items}
+
+    return False, None
+
+def merge_update(pending: Dict[str, Dict[str, Any]], data: Dict[str, Dict[str, Any]]) -> bool:
+    """Merges the update data into the pending update in place.
+       Returns False, leaving pending untouched, when the two updates touch the same field
+       in a way MongoDB cannot express in a single update.
+    """
+    merged = {operator: dict(fields) for operator, fields in pending.items()}
+    for operator, fields in data.items():
+        if operator not in MERGEABLE_OPERATORS:
+            return False
+
+        for path, value in fields.items():
+            for other_operator, other_fields in merged.items():
+                for other_path in other_fields:
+                    if not _overlaps(path, other_path):
+                        continue
+
+                    if other_operator != operator or other_path != path:
+                        return False
+
+            target = merged.setdefault(operator, {})
+            if path in target:
+                ok, value = _merge_field(operator, target[path], value)
+                if not ok:
+                    return False
+            target[path] = value
+
+    pending.clear()
+    pending.update(merged)
+    return True
+
+class WriteBuffer:
+    """Buffers MongoDB updates and writes them with bulk_write.
+       Updates of the same document are merged while they wait,
+       so a document written many times between two flushes costs one operation.
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, max_size: int = FLUSH_SIZE) -> None:
+        self._interval: float = interval
+        self._max_size: int = max_size
+
+        # (collection name, filter) -> the collection, its filter, the updates still to write in order
+        # and whether the document is created by the first of them if it does not exist.
+        self._pending: Dict[Tuple[str, tuple], Tuple[AsyncIOMotorCollection, dict, List[dict], bool]] = {}
+        self._size: int = 0
+        self._flushing: set = set()
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+        # Documents being read -> the number of reads, and how many flushes took their updates since.
+        self._readers: Dict[Tuple[str, tuple], int] = {}
+        self._flush_marks: Dict[Tuple[str, tuple], int] = {}
+
+        self.flushes: int = 0
+        self.written: int = 0
+        self.merged: int = 0
+        self.errors: int = 0
+        self.flush_latency_total: float = 0.0
+        self.flush_latency_max: float = 0.0
+        self.last_flush_latency: float = 0.0
+
+    @property
+    def backlog(self) -> int:
+        """The number of updates waiting to be written."""
+        return sum(len(entry[2]) for entry in self._pending.values())
+
+    def _key(self, collection: AsyncIOMotorCollection, filter: dict) -> Tuple[str, tuple]:
+        return collection.full_name, tuple(sorted(filter.items()))
+
+    def is_pending(self, collection: AsyncIOMotorCollection, filter: dict) -> bool:
+        """Whether the document has updates that are not in the database yet."""
+        key = self._key(collection, filter)
+        return key in self._pending or key in self._flushing
+
+    def is_flushing(self, collection: AsyncIOMotorCollection, filter: dict) -> bool:
+        """Whether updates of the document are being written right now."""
+        return self._key(collection, filter) in self._flushing
+
+    def pending_updates(self, collection: AsyncIOMotorCollection, filter: dict) -> List[dict]:
+        """Copies of the updates of the document waiting for the next flush, in order.
+           They can be applied to a document without sharing any value with the buffer.
+        """
+        entry = self._pending.get(self._key(collection, filter))
+        return copy.deepcopy(entry[2]) if entry else []
+
+    def add(self, collection: AsyncIOMotorCollection, filter: dict, data: Dict[str, Dict[str, Any]], *, upsert: bool = False) -> None:
+        """Queues an update of the document. The update is copied, values it shares
+           with the cached document are not changed in the queue by later updates.
+        """
+        data = copy.deepcopy(data)
+        key = self._key(collection, filter)
+        if (entry := self._pending.get(key)) is None or (upsert and not entry[3]):
+            entry = self._pending[key] = (collection, filter, entry[2] if entry else [], upsert)
+
+        updates = entry[2]
+        if updates and merge_update(updates[-1], data):
+            self.merged += 1
+        else:
+            updates.append(data)
+
+        self._size += 1
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._run())
+
+        if self._size >= self._max_size:
+            asyncio.get_running_loop().create_task(self.flush())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.flush()
+
+    async def read(self, collection: AsyncIOMotorCollection, filter: dict) -> Tuple[Optional[dict], List[dict]]:
+        """Reads a document consistently with the buffered updates, returns it with the updates
+           missing from it. Reads run concurrently with each other and with flushes: a read waits
+           only while the document's own updates are being written, and is retried when a flush
+           takes updates of the document before the read returns.
+        """
+        key = self._key(collection, filter)
+        while True:
+            while key in self._flushing:
+                async with self._lock:
+                    pass
+
+            # Every update of the document is pending now, none of them can be in the read.
+            self._readers[key] = self._readers.get(key, 0) + 1
+            mark = self._flush_marks.get(key, 0)
+            try:
+                document = await collection.find_one(filter)
+                if self._flush_marks.get(key, 0) == mark:
+                    return document, self.pending_updates(collection, filter)
+            finally:
+                self._readers[key] -= 1
+                if not self._readers[key]:
+                    del self._readers[key]
+                    self._flush_marks.pop(key, None)
+
+    async def flush(self) -> None:
+        """Writes every pending update, one bulk_write per collection."""
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending, self._size = self._pending, {}, 0
+        self._flushing = set(pending)
+        for key in self._readers.keys() & pending.keys():
+            self._flush_marks[key] = self._flush_marks.get(key, 0) + 1
+        started = time.perf_counter()
+
+        # Each update is kept with its document key, so the ones not written can be requeued.
+        requests: Dict[str, Tuple[AsyncIOMotorCollection, list]] = {}
+        for key, (collection, filter, updates, upsert) in pending.items():
+            requests.setdefault(collection.full_name, (collection, []))[1].extend((key, update) for update in updates)
+
+        retry: List[Tuple[Tuple[str, tuple], dict]] = []
+        for collection, entries in requests.values():
+            operations = [UpdateOne(pending[key][1], update, upsert=pending[key][3]) for key, update in entries]
+            try:
+                await collection.bulk_write(operations, ordered=True)
+                self.written += len(operations)
+            except BulkWriteError as e:
+                # The ordered write stopped at the rejected operation. Retrying it would fail
+                # the same way, so it is dropped and the operations after it are requeued.
+                self.errors += 1
+                if not (write_errors := e.details.get("writeErrors")):
+                    # Only the write concern failed, the updates were applied.
+                    self.written += len(operations)
+                    continue
+
+                index = write_errors[0]["index"]
+                self.written += index
+                print(f"Dropped a database update of {collection.full_name} {pending[entries[index][0]][1]}: {write_errors[0].get('errmsg')}")
+                retry.extend(entries[index + 1:])
+            except ConnectionFailure as e:
+                # Network errors and timeouts, AutoReconnect and NetworkTimeout included.
+                self.errors += 1
+                retry.extend(entries)
+                print(f"Database updates will be retried: {e}")
+            except Exception as e:
+                # Updates the server or the driver can never accept, e.g. documents BSON cannot encode.
+                self.errors += 1
+                print(f"Dropped {len(operations)} database updates of {collection.full_name}: {e}")
+
+        if retry:
+            self._requeue(pending, retry)
+        self._flushing = set()
+
+        latency = time.perf_counter() - started
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.flush_latency_total += latency
+        self.flush_latency_max = max(self.flush_latency_max, latency)
+
+    def _requeue(self, pending: dict, retry: List[Tuple[Tuple[str, tuple], dict]]) -> None:
+        """Puts updates that were not written back in front of the ones added since."""
+        requeued: Dict[Tuple[str, tuple], List[dict]] = {}
+        for key, update in retry:
+            requeued.setdefault(key, []).append(update)
+
+        for key, updates in requeued.items():
+            collection, filter, _, upsert = pending[key]
+            if (entry := self._pending.get(key)) is not None:
+                updates, upsert = updates + entry[2], upsert or entry[3]
+            self._pending[key] = (collection, filter, updates, upsert)
+            self._size += len(updates)
+
+    async def close(self) -> None:
+        """Stops the timer and writes what is left."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "backlog": self.backlog,
+            "documents": len(self._pending),
+            "flushes": self.flushes,
+            "written": self.written,
+            "merged": self.merged,
+            "errors": self.errors,
+            "last_flush_latency": self.last_flush_latency,
+            "avg_flush_latency": self.flush_latency_total / self.flushes if self.flushes else 0.0,
+            "max_flush_latency": self.flush_latency_max
+        }
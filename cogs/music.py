@@ -71,8 +71,7 @@ class Music(commands.Cog):
         if voicelink.pool.URL_REGEX.match(current): return
 
         history: dict[str, str] = {}
-        for track_id in reversed(await get_user(interaction.user.id, "history")):
-            track_dict = voicelink.decode(track_id)
+        for track_dict in voicelink.decode_many(reversed(await get_user(interaction.user.id, "history"))):
             history[track_dict["identifier"]] = track_dict
 
         history_tracks = [app_commands.Choice(name=truncate_string(f"🕒 {track['author']} - {track['title']}", 100), value=track['uri']) for track in history.values()][:25]
@@ -109,16 +108,18 @@ class Music(commands.Cog):
         if not player.is_user_join(ctx.author):
             return await send(ctx, "notInChannel", ctx.author.mention, player.channel.mention, ephemeral=True)
 
-        tracks = await player.get_tracks(query, requester=ctx.author)
+        tracks = await player.get_tracks(query, requester=ctx.author, stream=True)
         if not tracks:
             return await send(ctx, "noTrackFound")
 
         try:
             if isinstance(tracks, voicelink.Playlist):
                 index = await player.add_track(tracks.tracks)
-                music_add_message = await send(ctx, "playlistLoad", tracks.name, index)
-                await asyncio.sleep(5)
-                await music_add_message.delete()
+                if tracks.pages:
+                    # The rest is loaded in the background, up to what still fits in the queue.
+                    index += min(tracks.remaining_tracks, player.queue.room)
+                    player.ingest(tracks.pages)
+                await send(ctx, "playlistLoad", tracks.name, index, delete_after=5)
             else:
                 position = await player.add_track(tracks[0])
                 texts = await get_lang(ctx.guild.id, "live", "trackLoad_pos", "trackLoad")
@@ -152,13 +153,17 @@ class Music(commands.Cog):
         if not player.is_user_join(interaction.user):
             return await send(interaction, "notInChannel", interaction.user.mention, player.channel.mention, ephemeral=True)
 
-        tracks = await player.get_tracks(query, requester=interaction.user)
+        tracks = await player.get_tracks(query, requester=interaction.user, stream=True)
         if not tracks:
             return await send(interaction, "noTrackFound")
 
         try:
             if isinstance(tracks, voicelink.Playlist):
                 index = await player.add_track(tracks.tracks)
+                if tracks.pages:
+                    # The rest is loaded in the background, up to what still fits in the queue.
+                    index += min(tracks.remaining_tracks, player.queue.room)
+                    player.ingest(tracks.pages)
                 await send(interaction, "playlistLoad", tracks.name, index)
             else:
                 position = await player.add_track(tracks[0])
@@ -382,6 +387,7 @@ class Music(commands.Cog):
 
         if index:
             player.queue.skipto(index)
+            player.prefetch()
 
         song_skipped_message = await send(ctx, "skipped", ctx.author)
         await asyncio.sleep(5)
@@ -565,6 +571,7 @@ class Music(commands.Cog):
         else:
             queue = "queue"
             player.queue.clear()
+            player.prefetch()
 
         song_queue_cleared_message = await send(ctx, "cleared", queue.capitalize())
         await asyncio.sleep(5)
@@ -587,6 +594,7 @@ class Music(commands.Cog):
             return await send(ctx, "missingPerms_queue", ephemeral=True)
 
         removedTrack = player.queue.remove(position1, position2, member=member)
+        player.prefetch()
 
         removed_song_message = await send(ctx, "removed", len(removedTrack))
         await asyncio.sleep(5)
@@ -650,6 +658,7 @@ class Music(commands.Cog):
             return await send(ctx, "missingPerms_pos", ephemeral=True)
 
         track1, track2 = player.queue.swap(position1, position2)
+        player.prefetch()
         songs_swapped_message = await send(ctx, "swapped", track1.title, track2.title)
         await asyncio.sleep(5)
         await songs_swapped_message.delete()
@@ -670,6 +679,7 @@ class Music(commands.Cog):
             return await send(ctx, "missingPerms_pos", ephemeral=True)
 
         moved_track = player.queue.move(target, to)
+        player.prefetch()
         song_moved_message = await send(ctx, "moved", moved_track, to)
         await asyncio.sleep(5)
         await song_moved_message.delete()
@@ -12,6 +12,7 @@ class Task(commands.Cog):
         self.activity_update.start()
         self.player_check.start()
         self.cache_cleaner.start()
+        self.node_rebalancer.start()
 
         self.act_type = {
             "play": discord.ActivityType.playing,
@@ -26,6 +27,7 @@ class Task(commands.Cog):
         self.activity_update.cancel()
         self.player_check.cancel()
         self.cache_cleaner.cancel()
+        self.node_rebalancer.cancel()
     
     @tasks.loop(minutes=10.0)
     async def activity_update(self):
@@ -85,10 +87,19 @@ class Task(commands.Cog):
             except:
                 pass
     
+    @tasks.loop(seconds=30.0)
+    async def node_rebalancer(self):
+        await self.bot.wait_until_ready()
+
+        try:
+            await voicelink.NodePool.rebalance()
+        except:
+            pass
+
     @tasks.loop(hours=12.0)
     async def cache_cleaner(self):
-        func.SETTINGS_BUFFER.clear()
-        func.USERS_BUFFER.clear()
+        func.SETTINGS_BUFFER.purge()
+        func.USERS_BUFFER.purge()
 
         errorFile = func.gen_report()
         if errorFile:
@@ -5,7 +5,8 @@ from datetime import datetime
 from time import strptime
 from io import BytesIO
 from typing import Optional, Union, Dict, Any
-from addons import Settings, TOKENS
+from addons import Settings, TOKENS, WriteBuffer, DocumentCache, ChangeWatcher, readonly, unwrap
+from voicelink.utils import JSON_BACKEND, json_loads, json_dumps
 
 from motor.motor_asyncio import (
     AsyncIOMotorClient,
@@ -28,8 +29,10 @@ USERS_DB: AsyncIOMotorCollection
 ERROR_LOGS: dict[int, dict[int, str]] = {} #Stores error that not a Voicelink Exception
 LANGS: dict[str, dict[str, str]] = {} #Stores all the languages in ./langs
 LOCAL_LANGS: dict[str, dict[str, str]] = {} #Stores all the localization languages in ./local_langs
-SETTINGS_BUFFER: dict[int, dict[str, Any]] = {} #Cache guild language
-USERS_BUFFER: dict[str, dict] = {}
+SETTINGS_BUFFER: DocumentCache = DocumentCache(max_size=10000, ttl=3600, max_stale=3600) #Cache guild settings
+USERS_BUFFER: DocumentCache = DocumentCache(max_size=20000, ttl=1800, max_stale=1800)
+WRITE_BUFFER: WriteBuffer = WriteBuffer() #Batches the database updates, see update_db
+CHANGE_WATCHERS: list[ChangeWatcher] = [] #Keeps the buffers in sync with other processes, see start_change_watchers
 
 USERS_BASE: dict[str, Any] = {
     'history': []
@@ -37,11 +40,13 @@ USERS_BASE: dict[str, Any] = {
 
 ALLOWED_MENTIONS = discord.AllowedMentions().none()
 
+SETTINGS_PREFETCH_BATCH = 100
+
 #-------------- Yardsbot Functions --------------
 def open_json(path: str) -> dict:
     try:
-        with open(os.path.join(ROOT_DIR, path), encoding="utf8") as json_file:
-            return json.load(json_file)
+        with open(os.path.join(ROOT_DIR, path), "rb") as json_file:
+            return json_loads(json_file.read())
     except:
         return {}
 
@@ -148,7 +153,8 @@ async def send(ctx: Union[commands.Context, discord.Interaction], key: str, *par
     send_func = ctx.send if isinstance(ctx, commands.Context) else (ctx.followup.send if ctx.response.is_done() else ctx.response.send_message)
     return await send_func(text, delete_after=delete_after, ephemeral=ephemeral, allowed_mentions=ALLOWED_MENTIONS)
 
-async def update_db(db: AsyncIOMotorCollection, tempStore: dict, filter: dict, data: dict) -> bool:
+def apply_update(tempStore: dict, data: dict) -> bool:
+    """Applies a MongoDB update to the cached document, returns False for unsupported operators."""
     for mode, action in data.items():
         for key, value in action.items():
             cursors = key.split(".")
@@ -169,16 +175,11 @@ async def update_db(db: AsyncIOMotorCollection, tempStore: dict, filter: dict, d
             elif mode == "$inc":
                 nested_data[cursors[-1]] = nested_data.get(cursors[-1], 0) + value
 
-            elif mode == "$push":
-                if isinstance(value, dict) and "$each" in value:
-                    nested_data.setdefault(cursors[-1], []).extend(value["$each"][value.get("$slice", len(value["$each"])):])
-                else:
-                    nested_data.setdefault(cursors[-1], []).extend([value])
-                    
             elif mode == "$push":
                 if isinstance(value, dict) and "$each" in value:
                     nested_data.setdefault(cursors[-1], []).extend(value["$each"])
-                    nested_data[cursors[-1]] = nested_data[cursors[-1]][value.get("$slice", len(value["$each"])):]
+                    if "$slice" in value:
+                        nested_data[cursors[-1]] = nested_data[cursors[-1]][value["$slice"]:] if value["$slice"] < 0 else nested_data[cursors[-1]][:value["$slice"]]
                 else:
                     nested_data.setdefault(cursors[-1], []).extend([value])
 
@@ -190,41 +191,78 @@ async def update_db(db: AsyncIOMotorCollection, tempStore: dict, filter: dict, d
             else:
                 return False
 
-    result = await db.update_one(filter, data)
-    return result.modified_count > 0
+    return True
+
+async def update_db(db: AsyncIOMotorCollection, tempStore: dict, filter: dict, data: dict) -> bool:
+    """Updates the cached document right away, the database write is batched by WRITE_BUFFER.
+       Documents are only created by their first write, with an upsert.
+       Values read from get_user are unwrapped first, read-only views cannot be BSON encoded.
+    """
+    data = unwrap(data)
+    if not apply_update(tempStore, data):
+        return False
+
+    WRITE_BUFFER.add(db, filter, data, upsert=True)
+    return True
+
+def start_change_watchers() -> None:
+    for db, cache in ((SETTINGS_DB, SETTINGS_BUFFER), (USERS_DB, USERS_BUFFER)):
+        watcher = ChangeWatcher(db, cache, write_buffer=WRITE_BUFFER, apply_update=apply_update)
+        watcher.start()
+        CHANGE_WATCHERS.append(watcher)
+
+async def load_document(db: AsyncIOMotorCollection, filter: dict) -> Optional[dict]:
+    """Reads a document with its buffered updates applied on top,
+       so refreshing a cached document never reverts an update of this process.
+    """
+    document, updates = await WRITE_BUFFER.read(db, filter)
+    if updates:
+        document = document if document is not None else dict(filter)
+        for update in updates:
+            apply_update(document, update)
+
+    return document
+
+async def _load_settings(guild_id: int) -> dict[str, Any]:
+    return await load_document(SETTINGS_DB, {"_id": guild_id}) or {}
 
 async def get_settings(guild_id:int) -> dict[str, Any]:
-    settings = SETTINGS_BUFFER.get(guild_id, None)
-    if not settings:
-        settings = await SETTINGS_DB.find_one({"_id": guild_id})
-        if not settings:
-            await SETTINGS_DB.insert_one({"_id": guild_id})
-            
-        settings = SETTINGS_BUFFER[guild_id] = settings or {}
-    return settings
+    return await SETTINGS_BUFFER.fetch(guild_id, _load_settings)
+
+async def prefetch_settings(guild_ids: list[int]) -> None:
+    """Loads the settings of many guilds with one query per batch, guilds already cached are skipped."""
+    guild_ids = [guild_id for guild_id in guild_ids if guild_id not in SETTINGS_BUFFER]
+    for index in range(0, len(guild_ids), SETTINGS_PREFETCH_BATCH):
+        batch = guild_ids[index:index + SETTINGS_PREFETCH_BATCH]
+        found = {settings["_id"]: settings async for settings in SETTINGS_DB.find({"_id": {"$in": batch}})}
+
+        for guild_id in batch:
+            if guild_id not in SETTINGS_BUFFER:
+                SETTINGS_BUFFER.put(guild_id, found.get(guild_id, {}))
 
 async def update_settings(guild_id: int, data: dict[str, dict[str, Any]]) -> bool:
     settings = await get_settings(guild_id)
     return await update_db(SETTINGS_DB, settings, {"_id": guild_id}, data)
             
-async def get_user(user_id: int, d_type: Optional[str] = None, need_copy: bool = True) -> Dict[str, Any]:
-    user = USERS_BUFFER.get(user_id)
-    if not user:
-        user = await USERS_DB.find_one({"_id": user_id})
-        if not user:
-            user = {"_id": user_id, **USERS_BASE}
-            await USERS_DB.insert_one(user)
-    
-        USERS_BUFFER[user_id] = user
+async def _load_user(user_id: int) -> Dict[str, Any]:
+    user = await load_document(USERS_DB, {"_id": user_id})
+    return {"_id": user_id, **copy.deepcopy(USERS_BASE), **(user or {})}
+
+async def get_user(user_id: int, d_type: Optional[str] = None, need_copy: bool = False) -> Dict[str, Any]:
+    """Returns a read-only view of the cached user, or a mutable deep copy with need_copy.
+       The view is the default since it costs nothing, callers that used to modify the returned
+       dict must pass need_copy=True. Changes are saved through update_user.
+    """
+    user = await USERS_BUFFER.fetch(user_id, _load_user)
         
     if d_type:
         user = user.setdefault(d_type, copy.deepcopy(USERS_BASE.get(d_type)))
             
-    return copy.deepcopy(user) if need_copy else user
+    return copy.deepcopy(user) if need_copy else readonly(user)
 
 async def update_user(user_id:int, data:dict) -> bool:
-    playlist = await get_user(user_id, need_copy=False)
-    return await update_db(USERS_DB, playlist, {"_id": user_id}, data)
+    user = await USERS_BUFFER.fetch(user_id, _load_user)
+    return await update_db(USERS_DB, user, {"_id": user_id}, data)
 
 async def is_email_registered(email: str) -> bool:
     return await USERS_DB.find_one({"email": email}) is not None
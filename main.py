@@ -26,6 +26,12 @@ class Yardsbot(commands.Bot):
 
         await self.process_commands(message)
 
+    async def close(self) -> None:
+        for watcher in func.CHANGE_WATCHERS:
+            watcher.stop()
+        await func.WRITE_BUFFER.close()
+        await super().close()
+
     async def connect_db(self) -> None:
         if not ((db_name := func.tokens.mongodb_name) and (db_url := func.tokens.mongodb_url)):
             raise Exception("MONGODB_NAME and MONGODB_URL can't not be empty in settings.json")
@@ -41,6 +47,9 @@ class Yardsbot(commands.Bot):
         func.SETTINGS_DB = func.MONGO_DB[db_name]["Settings"]
         func.USERS_DB = func.MONGO_DB[db_name]["Users"]
 
+        if func.settings.change_streams:
+            func.start_change_watchers()
+
     async def setup_hook(self) -> None:
         func.langs_setup()
         
@@ -67,6 +76,12 @@ class Yardsbot(commands.Bot):
         func.tokens.client_id = self.user.id
         func.LOCAL_LANGS.clear()
 
+        # Guilds the bot is still playing in get their settings in a few queries instead of one each.
+        try:
+            await func.prefetch_settings([guild.id for guild in self.guilds if guild.me and guild.me.voice])
+        except Exception as e:
+            print(f"Not able to prefetch guild settings! Reason: {e}")
+
     async def on_command_error(self, ctx: commands.Context, exception, /) -> None:
         error = getattr(exception, 'original', exception)
         if ctx.interaction:
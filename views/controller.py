@@ -352,6 +352,7 @@ class Tracks(discord.ui.Select):
             return await func.send(interaction, "missingPerms_function", ephemeral=True)
         
         self.player.queue.skipto(int(self.values[0].split(". ")[0]))
+        self.player.prefetch()
         await self.player.stop()
 
         if self.player.settings.get("controller_msg", True):
@@ -18,7 +18,7 @@ class ListView(discord.ui.View):
         self.player: Player = player
 
         self.is_queue: bool = is_queue
-        self.tracks: list[Track] = player.queue.tracks() if is_queue else player.queue.history()
+        self.tracks: list[Track] = list(player.queue.tracks() if is_queue else player.queue.history())
         self.response: discord.Message = None
 
         if not is_queue:
@@ -13,4 +13,4 @@ from .player import Player, connect_channel
 from .pool import *
 from .queue import *
 from .placeholders import Placeholders, build_embed
-from .formatter import encode, decode
+from .formatter import encode, decode, encode_many, decode_many
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-import base64, io, abc, struct, dataclasses
+import base64, binascii, math, struct, dataclasses
 
-from typing import Union, BinaryIO, Optional, TYPE_CHECKING
+from typing import Union, Optional, Iterable, List, Tuple, TYPE_CHECKING
+from .utils import LRUCache
 if TYPE_CHECKING:
     from .objects import Track
 
@@ -14,184 +15,181 @@ class Codec:
     def encode(self, data: str) -> bytes:
         return data.encode(self.encoding, self.error_handler)
 
-    def decode(self, data: bytes) -> str:
-        return data.decode(self.encoding, self.error_handler)
+    def decode(self, data: Union[bytes, memoryview]) -> str:
+        return str(data, self.encoding, self.error_handler)
 
 UTF8 = Codec("utf-8", "surrogatepass")
 
-_FORMAT_BOOL = "?"
-_FORMAT_BYTE = "b"
-_FORMAT_INT = ">i"
-_FORMAT_LONG = ">q"
-_FORMAT_USHORT = ">H"
+_BOOL = struct.Struct("?")
+_BYTE = struct.Struct("b")
+_INT = struct.Struct(">i")
+_LONG = struct.Struct(">q")
+_USHORT = struct.Struct(">H")
 
-class HasStream(abc.ABC):
-    @property
-    @abc.abstractmethod
-    def stream(self) -> BinaryIO:
-        ...
-
-class Reader(HasStream):
-    def __init__(self, stream: Union[BinaryIO, HasStream]) -> None:
-        self._stream: BinaryIO = stream.stream if isinstance(stream, HasStream) else stream
-
-    @property
-    def stream(self) -> BinaryIO:
-        return self._stream
-
-    def read_bool(self) -> bool:
-        return struct.unpack(_FORMAT_BOOL, self._stream.read(1))[0]
-
-    def read_byte(self) -> int:
-        return struct.unpack(_FORMAT_BYTE, self._stream.read(1))[0]
-
-    def read_int(self) -> int:
-        return struct.unpack(_FORMAT_INT, self._stream.read(4))[0]
+# Header flag of messages that start with a version byte, messages without it are version 1.
+TRACK_INFO_VERSIONED = 1
 
-    def read_long(self) -> int:
-        return struct.unpack(_FORMAT_LONG, self._stream.read(8))[0]
+def _read_utf(view: memoryview, offset: int) -> Tuple[str, int]:
+    """Reads a length prefixed string at offset and returns it with the next offset."""
+    length = _USHORT.unpack_from(view, offset)[0]
+    offset += 2
+    if offset + length > len(view):
+        raise ValueError("unexpected end of message")
 
-    def read_ushort(self) -> int:
-        return struct.unpack(_FORMAT_USHORT, self._stream.read(2))[0]
+    return UTF8.decode(view[offset:offset + length]), offset + length
 
-    def read_utf(self) -> str:
-        length = self.read_ushort()
-        data = self._stream.read(length)
-        return UTF8.decode(data)
-
-    def read_optional_utf(self) -> Optional[str]:
-        if self.read_bool():
-            return self.read_utf()
-        else:
-            return None
+def _read_optional_utf(view: memoryview, offset: int) -> Tuple[Optional[str], int]:
+    if view[offset]:
+        return _read_utf(view, offset + 1)
+    return None, offset + 1
 
 class Writer:
-    _stream: BinaryIO
+    """Writes primitive values into a single growing bytearray."""
 
-    def __init__(self, stream: Union[BinaryIO, HasStream] = None ) -> None:
-        if stream is None:
-            stream = io.BytesIO()
-        elif isinstance(stream, HasStream):
-            stream = stream.stream
+    __slots__ = ("_buffer",)
 
-        self._stream = stream
-        self._string_codec: Codec = UTF8
+    def __init__(self, buffer: Optional[bytearray] = None) -> None:
+        self._buffer: bytearray = bytearray() if buffer is None else buffer
 
     @property
-    def stream(self) -> BinaryIO:
-        return self._stream
+    def buffer(self) -> bytearray:
+        return self._buffer
 
     def write_bool(self, data: bool) -> None:
-        self._stream.write(struct.pack(_FORMAT_BOOL, data))
+        self._buffer += _BOOL.pack(data)
 
     def write_byte(self, data: int) -> None:
-        self._stream.write(struct.pack(_FORMAT_BYTE, data))
+        self._buffer += _BYTE.pack(data)
 
     def write_int(self, data: int) -> None:
-        self._stream.write(struct.pack(_FORMAT_INT, data))
+        self._buffer += _INT.pack(data)
 
     def write_long(self, data: int) -> None:
-        self._stream.write(struct.pack(_FORMAT_LONG, data))
+        self._buffer += _LONG.pack(data)
 
     def write_ushort(self, data: int) -> None:
-        self._stream.write(struct.pack(_FORMAT_USHORT, data))
+        self._buffer += _USHORT.pack(data)
 
     def write_utf(self, data: str) -> None:
-        data = self._string_codec.encode(data)
-        self.write_ushort(len(data))
-        self._stream.write(data)
+        data = UTF8.encode(data)
+        self._buffer += _USHORT.pack(len(data))
+        self._buffer += data
 
     def write_optional_utf(self, data: Optional[str]) -> None:
         if data is None:
-            self.write_bool(False)
+            self._buffer.append(0)
         else:
-            self.write_bool(True)
+            self._buffer.append(1)
             self.write_utf(data)
 
-class MessageInput(HasStream):
-    def __init__(self, stream: Union[BinaryIO, HasStream]) -> None:
-        self._stream: Reader = Reader(stream)
-        self._flags: int = 0
-        self._size: int = 0
-
-    @property
-    def stream(self) -> BinaryIO:
-        return self._stream.stream
-
-    @property
-    def flags(self) -> int:
-        return self._flags
-
-    def next(self) -> Optional[Reader]:
-        value = self._stream.read_int()
-        self._flags = (value & 0xC0000000) >> 30
-        self._size = value & 0x3FFFFFFF
-
-        if not self._size:
-            return None
-
-        data = self._stream.stream.read(self._size)
-
-        return Reader(io.BytesIO(data))
+class MessageOutput:
+    """Writes a message body into a buffer and prefixes it with its header on commit."""
 
-class MessageOutput(HasStream):
-    _stream: Writer
-    _body_stream: io.BytesIO
+    __slots__ = ("_buffer",)
 
-    def __init__(self, stream: Union[BinaryIO, HasStream]) -> None:
-        self._string_codec: Codec = UTF8
-
-        self._stream = Writer(stream)
-        self._body_stream = io.BytesIO()
+    def __init__(self) -> None:
+        self._buffer: bytearray = bytearray(4)
 
     @property
-    def stream(self) -> BinaryIO:
-        return self._stream.stream
+    def buffer(self) -> bytearray:
+        return self._buffer
 
     def start(self) -> Writer:
-        self._body_stream.truncate(0)
-        self._body_stream.seek(0)
-        return Writer(self._body_stream)
+        del self._buffer[4:]
+        return Writer(self._buffer)
 
-    def commit(self, flags: int = None) -> None:
-        data = self._body_stream.getvalue()
-        header = len(data)
+    def commit(self, flags: int = None) -> bytearray:
+        header = len(self._buffer) - 4
         if flags:
             header |= flags << 30
 
-        self._stream.write_int(header)
-        self._stream.stream.write(data)
-
-    def finish(self) -> None:
-        self._stream.write_int(0)
+        _INT.pack_into(self._buffer, 0, header)
+        return self._buffer
 
 class TrackDecoder:
-    """TrackDecoder for track messages."""
-
-    def decode(self, stream: MessageInput):
-        """Decode an entire message and return the `Track`."""
-
-        body_reader = stream.next()
-        if not body_reader:
+    """TrackDecoder for track messages.
+
+       Works on a single memoryview over the message with precompiled structs,
+       no intermediate streams or copies of the body are made.
+       The version is read from the header flags like Lavaplayer does: versioned
+       messages (2 and 3) start with a version byte, unversioned ones are version 1.
+       `TrackEncoder` writes unversioned messages starting with a 0 byte (version 0),
+       those are recognised by their layout.
+       Source specific data appended by Lavalink or its plugins is skipped,
+       the track position is always the last field of the message.
+    """
+
+    SUPPORTED_VERSIONS = (0, 1, 2, 3)
+
+    def decode(self, data: Union[bytes, bytearray, memoryview]) -> dict:
+        """Decode an entire message and return the track info."""
+
+        view = memoryview(data)
+        header = _INT.unpack_from(view, 0)[0]
+        flags, size = (header >> 30) & 3, header & 0x3FFFFFFF
+        if not size:
             raise ValueError("empty stream")
 
-        version = body_reader.read_byte()
+        end = 4 + size
+        if end > len(view) or size < 9:
+            raise ValueError("truncated track message")
+
+        view = view[:end]
+        if flags & TRACK_INFO_VERSIONED:
+            version = view[4]
+            if version not in self.SUPPORTED_VERSIONS:
+                raise ValueError(f"unsupported track message version {version}")
+            return self._decode_body(view, 5, version, end)[0]
+
+        if view[4] == 0:
+            # Messages written by TrackEncoder. They have no trailing data,
+            # so the body has to end right before the position.
+            try:
+                info, offset = self._decode_body(view, 5, 0, end)
+                if offset == end - 8:
+                    return info
+            except (ValueError, IndexError, struct.error):
+                pass
+
+        return self._decode_body(view, 4, 1, end)[0]
+
+    def _decode_body(self, view: memoryview, offset: int, version: int, end: int) -> Tuple[dict, int]:
+        """Reads the fields of the given version from offset, returns the info and the offset after them."""
+        title, offset = _read_utf(view, offset)
+        author, offset = _read_utf(view, offset)
+        length = _LONG.unpack_from(view, offset)[0]
+        identifier, offset = _read_utf(view, offset + 8)
+        is_stream = bool(view[offset])
+        offset += 1
+
+        uri = artwork_url = isrc = None
+        if version != 1:
+            uri, offset = _read_optional_utf(view, offset)
+        if version in (0, 3):
+            artwork_url, offset = _read_optional_utf(view, offset)
+        if version == 3:
+            isrc, offset = _read_optional_utf(view, offset)
+        source_name, offset = _read_utf(view, offset)
+
+        if end - offset < 8:
+            raise ValueError("truncated track message")
 
         return {
-            "title": body_reader.read_utf(),
-            "author": body_reader.read_utf(),
-            "length": body_reader.read_long(),
-            "identifier": body_reader.read_utf(),
-            "is_stream": body_reader.read_bool(),
-            "uri": body_reader.read_optional_utf(),
-            "artworkUrl": None if version not in [0, 3] else body_reader.read_optional_utf(),
-            "isrc": None if version != 3 else body_reader.read_optional_utf(),
-            "sourceName": body_reader.read_utf(),
-            "position": body_reader.read_long()
-        }
-    
+            "title": title,
+            "author": author,
+            "length": length,
+            "identifier": identifier,
+            "isStream": is_stream,
+            "isSeekable": not is_stream,
+            "uri": uri,
+            "artworkUrl": artwork_url,
+            "isrc": isrc,
+            "sourceName": source_name,
+            "position": _LONG.unpack_from(view, end - 8)[0]
+        }, offset
+
 class TrackEncoder:
-    def encode(self, stream: MessageOutput, track: Track) -> None:
+    def encode(self, stream: MessageOutput, track: Track) -> bytearray:
         body_writer = stream.start()
 
         body_writer.write_byte(0)
@@ -205,15 +203,54 @@ class TrackEncoder:
         body_writer.write_utf(track.source)
         body_writer.write_long(0)
 
-        stream.commit()
+        # Left unversioned, track ids saved in playlists and history compare by their blob.
+        return stream.commit()
+
+_DECODER = TrackDecoder()
+_ENCODER = TrackEncoder()
+
+# Process wide caches between encoded blobs and track info, shared by every caller of encode/decode.
+# Each entry holds a single track (well under 1KB), so the caps keep both caches to a few megabytes.
+DECODE_CACHE_SIZE = 4096
+ENCODE_CACHE_SIZE = 4096
+
+DECODE_CACHE: LRUCache = LRUCache(max_size=DECODE_CACHE_SIZE, ttl=math.inf)
+ENCODE_CACHE: LRUCache = LRUCache(max_size=ENCODE_CACHE_SIZE, ttl=math.inf)
+
+def _encode_key(track) -> tuple:
+    return (
+        track.title, track.author, track.length, track.identifier,
+        track.is_stream, track.uri, track.thumbnail, track.source
+    )
 
 def decode(data: Union[str, bytes]) -> dict:
-    decoded = base64.b64decode(data)
-    stream = MessageInput(io.BytesIO(decoded))
-    return TrackDecoder().decode(stream)
-
-def encode(track) -> bytes:
-    buf = io.BytesIO()
-    stream = MessageOutput(buf)
-    TrackEncoder().encode(stream, track)
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+    """Decodes a base64 track blob into its info dict.
+       Results are cached per blob, a new dict is returned on every call.
+    """
+    if (info := DECODE_CACHE.get(data)) is None:
+        info = _DECODER.decode(binascii.a2b_base64(data))
+        DECODE_CACHE.put(data, info)
+
+    return info.copy()
+
+def decode_many(data: Iterable[Union[str, bytes]]) -> List[dict]:
+    return [decode(item) for item in data]
+
+def encode(track) -> str:
+    """Encodes a track into a base64 blob, reusing the blob of an identical track when cached."""
+    key = _encode_key(track)
+    if (blob := ENCODE_CACHE.get(key)) is None:
+        blob = base64.b64encode(_ENCODER.encode(MessageOutput(), track)).decode("utf-8")
+        ENCODE_CACHE.put(key, blob)
+
+    return blob
+
+def encode_many(tracks: Iterable[Track]) -> List[str]:
+    return [encode(track) for track in tracks]
+
+def cache_stats() -> dict:
+    """Returns the hit and size stats of the decode and encode caches."""
+    return {
+        "decode": DECODE_CACHE.stats(),
+        "encode": ENCODE_CACHE.stats()
+    }
@@ -1,15 +1,13 @@
 
 import re
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from discord import Member
 from tldextract import extract
 
+import function as func
+
 from .enums import SearchType
-from function import (
-    get_source,
-    time as ctime
-)
 
 from .spotify import Playlist as spPlaylist
 from .formatter import encode
@@ -72,7 +70,7 @@ class Track:
         if not self.thumbnail and YOUTUBE_REGEX.match(self.uri):
             self.thumbnail = f"https://img.youtube.com/vi/{self.identifier}/maxresdefault.jpg"
         
-        self.emoji: str = get_source(self.source, "emoji")
+        self.emoji: str = func.get_source(self.source, "emoji")
         self.length: float = 3000 if self.source == "soundcloud" and "/preview/" in self.identifier else info.get("length")
         
         self.requester: Member = requester
@@ -108,7 +106,7 @@ class Track:
     
     @property
     def formatted_length(self) -> str:
-        return ctime(self.length)
+        return func.time(self.length)
     
 class Playlist:
     """The base playlist object.
@@ -124,7 +122,8 @@ class Playlist:
         "spotify_playlist",
         "_thumbnail",
         "_uri",
-        "tracks"
+        "tracks",
+        "pages"
     )
 
     def __init__(
@@ -134,13 +133,16 @@ class Playlist:
         tracks: list,
         requester: Member = None,
         spotify: bool = False,
-        spotify_playlist: Optional[spPlaylist] = None
+        spotify_playlist: Optional[spPlaylist] = None,
+        pages: Optional[AsyncIterator[list[Track]]] = None
     ):
         self.playlist_info: dict = playlist_info
         self.tracks_raw: list[Track] = tracks
         self.spotify: bool = spotify
         self.name: str = playlist_info.get("name")
         self.spotify_playlist: Optional[spPlaylist] = spotify_playlist
+        # Remaining pages of a streamed playlist, `tracks` only holds the first page.
+        self.pages: Optional[AsyncIterator[list[Track]]] = pages
 
         self._thumbnail: str = None
         self._uri: str = None
@@ -176,3 +178,10 @@ class Playlist:
     @property
     def track_count(self) -> int:
         return len(self.tracks)
+
+    @property
+    def remaining_tracks(self) -> int:
+        """Property which returns how many tracks are still to be loaded from `pages`."""
+        if not self.pages or not self.spotify_playlist:
+            return 0
+        return max(getattr(self.spotify_playlist, "loadable_tracks", 0) - len(self.tracks), 0)
@@ -2,10 +2,11 @@ import time
 import function as func
 
 from math import ceil
-from asyncio import sleep
+from asyncio import ensure_future, gather, shield, sleep, Semaphore, Task
 from views import InteractiveController
 from typing import (
     Any,
+    AsyncIterator,
     Dict,
     Optional,
     Union,
@@ -27,7 +28,7 @@ from discord.ext import commands
 from . import events
 from .enums import SearchType, LoopType
 from .events import VoicelinkEvent, TrackEndEvent, TrackStartEvent
-from .exceptions import VoicelinkException, FilterInvalidArgument, TrackInvalidPosition, TrackLoadError, FilterTagAlreadyInUse, DuplicateTrack
+from .exceptions import VoicelinkException, FilterInvalidArgument, TrackInvalidPosition, TrackLoadError, FilterTagAlreadyInUse, DuplicateTrack, QueueFull
 from .filters import Filter, Filters
 from .objects import Track, Playlist
 from .pool import Node, NodePool
@@ -35,6 +36,16 @@ from .queue import Queue, FairQueue
 from .placeholders import Placeholders, build_embed
 from random import shuffle, choice
 
+# How many upcoming Spotify tracks are resolved to a playable source ahead of time.
+PREFETCH_TRACKS = 3
+PREFETCH_CONCURRENCY = 2
+
+# Player updates queued within UPDATE_WINDOW seconds of each other are sent to Lavalink as one PATCH.
+UPDATE_WINDOW = 0.02
+
+# A source found by ISRC is only trusted if its length is within this many milliseconds of the Spotify track.
+ISRC_LENGTH_TOLERANCE = 5000
+
 async def connect_channel(ctx: Union[commands.Context, Interaction], channel: VoiceChannel = None):
     texts = await func.get_lang(ctx.guild.id, "noChannel", "noPermission")
     try:
@@ -103,6 +114,12 @@ class Player(VoiceProtocol):
         self._ending_track: Optional[Track] = None
 
         self._voice_state: dict = {}
+        self._ingest_tasks: set[Task] = set()
+        self._prefetch_task: Optional[Task] = None
+
+        self._pending_update: dict = {}
+        self._pending_query: Optional[str] = None
+        self._update_task: Optional[Task] = None
 
         self.controller: Message = None
         self.updating: bool = False
@@ -236,18 +253,41 @@ class Player(VoiceProtocol):
         self._last_position = state.get("position")
         self._ping = state.get("ping")
 
-    async def _dispatch_voice_update(self, voice_data: Dict[str, Any]):
-        if {"sessionId", "event"} != self._voice_state.keys():
-            return
+    async def _send_update(self, data: dict, *, query: str = None) -> None:
+        """Queues fields for the next PATCH of this player.
+           Updates queued within UPDATE_WINDOW are merged into a single request,
+           later values win, and every caller waits for that shared request.
+        """
+        self._pending_update.update(data)
+        if query:
+            self._pending_query = query
 
-        await self._node.send(
-            method=0, guild_id=self._guild.id,
-            data = {"voice": {
-                "token": voice_data['event']['token'],
-                "endpoint": voice_data['event']['endpoint'],
-                "sessionId": voice_data['sessionId'],
-            }}
-        )
+        if not self._update_task:
+            self._update_task = ensure_future(self._flush_update())
+
+        await shield(self._update_task)
+
+    async def _flush_update(self) -> None:
+        await sleep(UPDATE_WINDOW)
+
+        data, query = self._pending_update, self._pending_query
+        self._pending_update, self._pending_query, self._update_task = {}, None, None
+        if data:
+            await self._node.send(method=0, guild_id=self._guild.id, data=data, query=query)
+
+    def _voice_payload(self, voice_data: Dict[str, Any]) -> Optional[dict]:
+        if {"sessionId", "event"} != voice_data.keys():
+            return None
+
+        return {
+            "token": voice_data['event']['token'],
+            "endpoint": voice_data['event']['endpoint'],
+            "sessionId": voice_data['sessionId'],
+        }
+
+    async def _dispatch_voice_update(self, voice_data: Dict[str, Any]):
+        if voice := self._voice_payload(voice_data):
+            await self._send_update({"voice": voice})
 
     async def on_voice_server_update(self, data: dict):
         self._voice_state.update({"event": data})
@@ -313,6 +353,8 @@ class Player(VoiceProtocol):
                 await sleep(5)
                 return await self.do_next()
 
+            self.prefetch()
+
             if not track.requester.bot:
                 await func.update_user(track.requester.id, {
                     "$push": {"history": {"$each": [track.track_id], "$slice": -25}}
@@ -392,7 +434,9 @@ class Player(VoiceProtocol):
         query: str,
         *,
         requester: Member,
-        search_type: SearchType = SearchType.ytsearch
+        search_type: SearchType = SearchType.ytsearch,
+        use_cache: bool = True,
+        stream: bool = False
     ) -> Union[List[Track], Playlist]:
         """Fetches tracks from the node's REST api to parse into Lavalink.
 
@@ -403,7 +447,7 @@ class Player(VoiceProtocol):
         You can also pass in a discord.py Context object to get a
         Context object on any track you search.
         """
-        return await self._node.get_tracks(query, requester=requester, search_type=search_type)
+        return await self._node.get_tracks(query, requester=requester, search_type=search_type, use_cache=use_cache, stream=stream)
 
     async def connect(self, *, timeout: float, reconnect: bool, self_deaf: bool = True, self_mute: bool = False):
         await self.guild.change_voice_state(channel=self.channel, self_deaf=True, self_mute=self_mute)
@@ -413,7 +457,7 @@ class Player(VoiceProtocol):
     async def stop(self):
         """Stops the currently playing track."""
         self._current = None
-        await self._node.send(method=0, guild_id=self._guild.id, data={'encodedTrack': None})
+        await self._send_update({'encodedTrack': None})
 
     async def disconnect(self, *, force: bool = False):
         """Disconnects the player from voice."""
@@ -426,6 +470,11 @@ class Player(VoiceProtocol):
 
     async def destroy(self):
         """Disconnects and destroys the player, and runs internal cleanup."""
+        for task in self._ingest_tasks:
+            task.cancel()
+
+        if self._prefetch_task:
+            self._prefetch_task.cancel()
         
         try:
             await self.disconnect()
@@ -434,6 +483,7 @@ class Player(VoiceProtocol):
             # assume we're already disconnected and cleaned up
             assert self.channel is None and not self.is_connected
         
+        self._pending_update.clear()
         self._node._players.pop(self.guild.id)
         await self._node.send(method=1, guild_id=self._guild.id)
         
@@ -449,17 +499,8 @@ class Player(VoiceProtocol):
         if not self._node:
             return track
 
-        if track.spotify:
-            if not track.original:
-                search: Track = (await self._node.get_tracks(
-                    f"ytsearch:{track.author} - {track.title}",
-                    requester=track.requester
-                ))
- 
-                if not search:
-                    raise TrackLoadError("Can't not found a playable source!")
-
-                track.original = search[0]
+        if track.spotify and not track.original:
+            await self.resolve_track(track)
             
         data = {
             "encodedTrack": track.original.track_id if track.original else track.track_id,
@@ -468,64 +509,128 @@ class Player(VoiceProtocol):
 
         if end > 0:
             data["endTime"] = str(end)
+
+        if self.volume != 100:
+            data["volume"] = self.volume
                   
-        await self._node.send(
-            method=0, guild_id=self._guild.id,
-            data=data,
-            query=f"noReplace={ignore_if_playing}"
-        )
+        await self._send_update(data, query=f"noReplace={ignore_if_playing}")
 
         self._current = track
-
-        if self.volume != 100:
-            await self.set_volume(self.volume)
-            
         return self._current
 
+    async def resolve_track(self, track: Track) -> Track:
+        """Resolves a Spotify track to a playable source and stores it as `track.original`.
+           The track's ISRC is searched first, falling back to searching its author and title.
+        """
+        if track.original:
+            return track.original
+
+        if isrc := track.info.get("isrc"):
+            search = await self._node.get_tracks(f'ytsearch:"{isrc}"', requester=track.requester)
+            if search and not isinstance(search, Playlist) and abs(search[0].length - track.length) <= ISRC_LENGTH_TOLERANCE:
+                track.original = search[0]
+                return track.original
+
+        search = await self._node.get_tracks(
+            f"ytsearch:{track.author} - {track.title}",
+            requester=track.requester
+        )
+
+        if not search:
+            raise TrackLoadError("Can't not found a playable source!")
+
+        track.original = search[0]
+        return track.original
+
+    def prefetch(self) -> None:
+        """Resolves the next few Spotify tracks of the queue in the background,
+           cancelling any prefetch still running for the previous queue state.
+        """
+        if self._prefetch_task:
+            self._prefetch_task.cancel()
+            self._prefetch_task = None
+
+        tracks = [track for track in self.queue.tracks()[:PREFETCH_TRACKS] if track.spotify and not track.original]
+        if tracks:
+            self._prefetch_task = self._bot.loop.create_task(self._prefetch(tracks))
+
+    async def _prefetch(self, tracks: List[Track]) -> None:
+        semaphore = Semaphore(PREFETCH_CONCURRENCY)
+
+        async def resolve(track: Track) -> None:
+            async with semaphore:
+                try:
+                    await self.resolve_track(track)
+                except Exception:
+                    pass
+
+        await gather(*(resolve(track) for track in tracks))
+
     async def add_track(self, raw_tracks: Union[Track, List[Track]], *, at_font: bool = False, duplicate: bool = True) -> int:
-        tracks = []
+        """Adds tracks to the queue.
+           Returns the number of added tracks for a list, or the queue position of a single track.
+        """
+        check_duplicate = not (self.queue._allow_duplicate and duplicate)
+
+        if isinstance(raw_tracks, List):
+            result = self.queue.put_many(raw_tracks, at_front=at_font, check_duplicate=check_duplicate)
+            if not result.added:
+                if result.rejected:
+                    raise QueueFull(self.get_msg("voicelinkQueueFull").format(self.queue._size))
+                return 0
+
+            self.prefetch()
+            return len(result.added)
 
-        _duplicate_tracks = () if self.queue._allow_duplicate and duplicate else (track.uri for track in self.queue._queue)
+        if check_duplicate and self.queue.is_duplicate(raw_tracks):
+            raise DuplicateTrack(self.get_msg("voicelinkDuplicateTrack"))
 
+        position = self.queue.put_at_front(raw_tracks) if at_font else self.queue.put(raw_tracks)
+        self.prefetch()
+        return position
+        
+    def ingest(self, pages: AsyncIterator[List[Track]]) -> Task:
+        """Keeps adding the remaining pages of a streamed playlist to the queue in the background.
+           The task stops once the queue is full and is cancelled when the player is destroyed.
+        """
+        task = self._bot.loop.create_task(self._ingest(pages))
+        self._ingest_tasks.add(task)
+        task.add_done_callback(self._ingest_tasks.discard)
+        return task
+
+    async def _ingest(self, pages: AsyncIterator[List[Track]]) -> None:
         try:
-            if (isList := isinstance(raw_tracks, List)):
-                for track in raw_tracks:
-                    if track.uri in _duplicate_tracks:
-                        continue
-                    self.queue.put_at_front(track) if at_font else self.queue.put(track)  
-                    tracks.append(track)
-            else:
-                if raw_tracks.uri in _duplicate_tracks:
-                    raise DuplicateTrack(self.get_msg("voicelinkDuplicateTrack"))
-                
-                position = self.queue.put_at_front(raw_tracks) if at_font else self.queue.put(raw_tracks)
-                tracks.append(raw_tracks)
+            async for tracks in pages:
+                await self.add_track(tracks)
+                if self.queue.count >= self.queue._size:
+                    break
+        except Exception:
+            pass
         finally:
-            if tracks:
-                return len(tracks) if isList else position
-        
+            await pages.aclose()
+
     async def seek(self, position: float, requester: Member = None) -> float:
         """Seeks to a position in the currently playing track milliseconds"""
         if position < 0 or position > self._current.original.length:
             raise TrackInvalidPosition("Seek position must be between 0 and the track length")
 
-        await self._node.send(method=0, guild_id=self._guild.id, data={"position": position})
+        await self._send_update({"position": position})
         return self._position
 
     async def set_pause(self, pause: bool, requester: Member = None) -> bool:
         """Sets the pause state of the currently playing track."""
-        await self._node.send(method=0, guild_id=self._guild.id, data={"paused": pause})
+        await self._send_update({"paused": pause})
         self._paused = pause
         return self._paused
 
     async def set_volume(self, volume: int, requester: Member = None) -> int:
         """Sets the volume of the player as an integer. Lavalink accepts values from 0 to 500."""
-        await self._node.send(method=0, guild_id=self._guild.id, data={"volume": volume})
+        await self._send_update({"volume": volume})
         self._volume = volume
         return self._volume
 
     async def shuffle(self, queue_type: str, requester: Member = None) -> None:
-        replacement = self.queue.tracks() if queue_type == "queue" else self.queue.history()
+        replacement = list(self.queue.tracks() if queue_type == "queue" else self.queue.history())
         if len(replacement) < 3:
             raise VoicelinkException(self.get_msg('shuffleError'))
         
@@ -533,6 +638,9 @@ class Player(VoiceProtocol):
         self.queue.replace(queue_type, replacement)
         self.shuffle_votes.clear()
 
+        if queue_type == "queue":
+            self.prefetch()
+
     async def set_repeat(self, mode: str = None) -> str:
         if not mode:
             mode = self.queue._repeat.next().name
@@ -554,51 +662,69 @@ class Player(VoiceProtocol):
             self._filters.add_filter(filter=filter)
         except FilterTagAlreadyInUse:
             raise FilterTagAlreadyInUse(self.get_msg("FilterTagAlreadyInUse"))
-        payload = self._filters.get_all_payloads()
-        await self._node.send(method=0, guild_id=self._guild.id, data={"filters": payload})
-        if fast_apply:
-            await self.seek(self.position)
+        await self._apply_filters(self._filters.get_all_payloads(), fast_apply)
         return self._filters
 
     async def remove_filter(self, filter_tag: str, fast_apply=False) -> Filters:
         self._filters.remove_filter(filter_tag=filter_tag)
-        payload = self._filters.get_all_payloads()
-        await self._node.send(method=0, guild_id=self._guild.id, data={"filters": payload})
-        if fast_apply:
-            await self.seek(self.position)
-        
+        await self._apply_filters(self._filters.get_all_payloads(), fast_apply)
         return self._filters
     
     async def reset_filter(self, *, fast_apply=False) -> None:
         if not self._filters:
             raise FilterInvalidArgument("You must have filters applied first in order to use this method.")
         self._filters.reset_filters()
-        await self._node.send(method=0, guild_id=self._guild.id, data={"filters": {}})
-        if fast_apply:
-            await self.seek(self.position)
+        await self._apply_filters({}, fast_apply)
+
+    async def _apply_filters(self, payload: dict, fast_apply: bool) -> None:
+        """Sends the filters, seeking to the current position in the same update when fast_apply is set."""
+        data = {"filters": payload}
+        if fast_apply and self._current:
+            data["position"] = self.position
+
+        await self._send_update(data)
 
     async def change_node(self, identifier: str = None) -> None:
-        """Change node."""
+        """Change node.
+           The position, pause state, volume and filters of the player are carried over.
+           Without an identifier, the best node other than the current one is used.
+        """
         try:
-            node = NodePool.get_node(identifier=identifier)
+            node = NodePool.get_node(identifier=identifier, exclude=None if identifier else self._node)
         except:
             return await self.teardown()
 
-        self._node._players.pop(self.guild.id)
-        self._node = node
+        if node is self._node:
+            return
+
+        position = self.position
+        old_node, self._node = self._node, node
+        old_node._players.pop(self.guild.id, None)
         self._node._players[self.guild.id] = self
 
-        await self._dispatch_voice_update(self._voice_state)
+        if old_node.is_connected:
+            try:
+                await old_node.send(method=1, guild_id=self._guild.id)
+            except:
+                pass
+
+        # The whole state is restored on the new node with a single update.
+        data = {"volume": self.volume, "paused": self.is_paused}
+        if voice := self._voice_payload(self._voice_state):
+            data["voice"] = voice
+
+        if self._filters.get_filters():
+            data["filters"] = self._filters.get_all_payloads()
         
         if self.current:
-            await self.play(self.current, start=self.position)
-            self._last_update = time.time() * 1000
+            if self.current.spotify and not self.current.original:
+                await self.resolve_track(self.current)
 
-            if self.is_paused:
-                await self.set_pause(True)
+            data["encodedTrack"] = (self.current.original or self.current).track_id
+            data["position"] = int(position)
 
-        if self.volume != 100:
-            await self.set_volume(self.volume)
+        await self._send_update(data)
+        self._last_update = time.time() * 1000
     
     async def get_recommendations(self, *, track: Track = None) -> bool:
         """Get recommendations from Youtube or Spotify."""
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import asyncio
-import os
 import re
+import struct
+import time
+import traceback
 import aiohttp
 
+from collections import deque
+from contextlib import asynccontextmanager
+
 from discord import Client, Member
 from discord.ext.commands import Bot
-from typing import Dict, Optional, TYPE_CHECKING, Union, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, TYPE_CHECKING, Union, List
 from urllib.parse import quote
 
 from . import (
@@ -25,8 +30,9 @@ from .exceptions import (
     NoNodesAvailable,
     TrackLoadError
 )
+from .formatter import decode
 from .objects import Playlist, Track
-from .utils import ExponentialBackoff, NodeStats, Ping
+from .utils import ConnectionPoolStats, ExponentialBackoff, LRUCache, NodeStats, json_dumps, json_loads
 
 if TYPE_CHECKING:
     from .player import Player
@@ -44,9 +50,163 @@ URL_REGEX = re.compile(
     r"https?://(?:www\.)?.+"
 )
 
+SEARCH_REGEX = re.compile(
+    r"(?P<type>\w+search):(?P<query>.+)", re.S
+)
+
 NODE_VERSION = "v4"
 CALL_METHOD = ["PATCH", "DELETE"]
 
+# Lavalink loadtracks results are cached per load type, errors and empty results are never cached.
+TRACK_CACHE_SIZE = 2048
+TRACK_CACHE_TTL = {
+    "search": 300,
+    "track": 3600,
+    "playlist": 1800
+}
+
+# Node latency is an exponentially weighted moving average of REST round trips in milliseconds.
+# When no sample is younger than LATENCY_MAX_AGE seconds, reading it schedules an active probe.
+LATENCY_SMOOTHING = 0.2
+LATENCY_MAX_AGE = 60
+
+# A node is considered degraded once one of these thresholds is crossed, see Node.is_degraded.
+DEGRADED_ERROR_RATE = 0.25
+DEGRADED_CPU_LOAD = 0.9
+DEGRADED_MEMORY_USAGE = 0.95
+DEGRADED_FRAME_LOSS = 0.05
+REST_SAMPLE_SIZE = 50
+
+# Players migrated off degraded nodes per rebalance, and the delay between two migrations.
+MIGRATION_BATCH_SIZE = 10
+MIGRATION_DELAY = 0.5
+
+# Seconds Lavalink keeps the session and its players alive after the websocket drops.
+# Players of a session that could not be resumed are replayed REPLAY_CONCURRENCY at a time.
+RESUME_TIMEOUT = 60
+REPLAY_CONCURRENCY = 10
+
+WS_CLOSED_TYPES = (
+    aiohttp.WSMsgType.CLOSE,
+    aiohttp.WSMsgType.CLOSING,
+    aiohttp.WSMsgType.CLOSED,
+    aiohttp.WSMsgType.ERROR
+)
+
+# Defaults of the keep-alive connection pool each node keeps to its REST api,
+# every one of them can be overridden per node in settings.json.
+HTTP_POOL_SIZE = 32
+HTTP_KEEPALIVE_TIMEOUT = 60
+HTTP_DNS_CACHE_TTL = 300
+HTTP_TIMEOUT = 15
+
+# Websocket payloads waiting to be handled, across all guilds of a node.
+# Once reached, the node stops reading its websocket until the handlers catch up.
+DISPATCH_QUEUE_SIZE = 1000
+
+# Every LATENCY_PENALTY_STEP milliseconds of latency add one point to a node's penalty.
+LATENCY_PENALTY_STEP = 10
+
+def _track_cache_key(query: str) -> tuple:
+    """Normalizes a loadtracks identifier into a cache key of (search type, identifier)."""
+    if match := SEARCH_REGEX.match(query):
+        return match.group("type"), " ".join(match.group("query").split()).casefold()
+
+    return "url", query.strip()
+
+class SingleFlight:
+    """Coalesces concurrent calls sharing the same key into one in-flight request.
+       Every caller awaits the same shared future, a caller being cancelled
+       does not cancel the request for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+        if not future.cancelled():
+            future.exception()
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        if (future := self._calls.get(key)) is None:
+            future = self._calls[key] = asyncio.ensure_future(func(*args, **kwargs))
+            future.add_done_callback(lambda f: self._done(key, f))
+
+        return await asyncio.shield(future)
+
+class OrderedDispatcher:
+    """Hands payloads to a handler in order per key, concurrently across keys.
+       Each key with pending payloads has one worker draining its queue, which
+       ends once the queue is empty. The number of pending payloads is bounded,
+       put waits for a free slot when the bound is reached.
+    """
+
+    def __init__(self, handler: Callable[[dict], Awaitable[None]], *, max_size: int = DISPATCH_QUEUE_SIZE) -> None:
+        self._handler = handler
+        self._slots: asyncio.Semaphore = asyncio.Semaphore(max_size)
+        self._queues: Dict[Hashable, deque] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+
+        self.pending: int = 0
+        self.max_depth: int = 0
+        self.handled: int = 0
+        self.latency_total: float = 0.0
+        self.latency_max: float = 0.0
+
+    def __len__(self) -> int:
+        return self.pending
+
+    async def put(self, key: Hashable, payload: dict) -> None:
+        await self._slots.acquire()
+        self.pending += 1
+
+        if (queue := self._queues.get(key)) is None:
+            queue = self._queues[key] = deque()
+            self._workers[key] = asyncio.ensure_future(self._work(key, queue))
+
+        queue.append((time.perf_counter(), payload))
+        self.max_depth = max(self.max_depth, len(queue))
+
+    async def _work(self, key: Hashable, queue: deque) -> None:
+        try:
+            while queue:
+                queued_at, payload = queue.popleft()
+                try:
+                    await self._handler(payload)
+                except Exception:
+                    print(traceback.format_exc())
+                finally:
+                    latency = time.perf_counter() - queued_at
+                    self.handled += 1
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+                    self.pending -= 1
+                    self._slots.release()
+        finally:
+            del self._queues[key]
+            del self._workers[key]
+
+    def close(self) -> None:
+        """Cancels every worker and drops the pending payloads."""
+        for worker in list(self._workers.values()):
+            worker.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "queues": len(self._queues),
+            "max_depth": self.max_depth,
+            "handled": self.handled,
+            "avg_latency": self.latency_total / self.handled if self.handled else 0.0,
+            "max_latency": self.latency_max
+        }
+
 class Node:
     """The base class for a node. 
        This node object represents a Lavalink node. 
@@ -67,7 +227,11 @@ class Node:
         session: Optional[aiohttp.ClientSession] = None,
         spotify_client_id: Optional[str] = None,
         spotify_client_secret: Optional[str] = None,
-        resume_key: Optional[str] = None
+        resume_timeout: int = RESUME_TIMEOUT,
+        http_pool_size: int = HTTP_POOL_SIZE,
+        http_keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        http_dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        http_timeout: float = HTTP_TIMEOUT
 
     ):
         self._bot: Bot = bot
@@ -82,23 +246,44 @@ class Node:
         self._websocket_uri: str = f"{'wss' if self._secure else 'ws'}://{self._host}:{self._port}/" + NODE_VERSION + "/websocket"
         self._rest_uri: str = f"{'https' if self._secure else 'http'}://{self._host}:{self._port}"
 
-        self._session: aiohttp.ClientSession = session or aiohttp.ClientSession()
+        self._pool_stats: ConnectionPoolStats = ConnectionPoolStats()
+        self._session: aiohttp.ClientSession = session or aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=http_pool_size,
+                keepalive_timeout=http_keepalive_timeout,
+                ttl_dns_cache=http_dns_cache_ttl
+            ),
+            trace_configs=[self._pool_stats.trace_config()],
+            json_serialize=json_dumps
+        )
+        self._pool_stats.connector = self._session.connector
+        # Passed per REST call, a session wide timeout would also cut the long lived websocket.
+        self._timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=http_timeout)
         self._websocket: aiohttp.ClientWebSocketResponse = None
         self._task: asyncio.Task = None
 
-        self.resume_key: str = resume_key or str(os.urandom(8).hex())
+        self._resume_timeout: int = resume_timeout
         self._session_id: str = None
         self._available: bool = None
+        # When the websocket dropped, None while connected. Lavalink keeps the session for resume_timeout seconds.
+        self._disconnected_at: Optional[float] = None
+        self._stats: Optional[NodeStats] = None
 
         self._headers: Dict[str, str] = {
             "Authorization": self._password,
             "User-Id": str(bot.user.id),
-            "Client-Name": f"Voicelink/{__version__}",
-            'Resume-Key': self.resume_key
+            "Client-Name": f"Voicelink/{__version__}"
         }
+        self._rest_headers: Dict[str, str] = {"Authorization": self._password}
 
         self._players: Dict[int, Player] = {}
 
+        self._latency: Optional[float] = None
+        self._latency_updated: float = 0
+        self._latency_probe: Optional[asyncio.Task] = None
+        self._rest_results: deque[bool] = deque(maxlen=REST_SAMPLE_SIZE)
+        self._dispatcher: OrderedDispatcher = OrderedDispatcher(self._handle_payload)
+
         self._spotify_client_id: Optional[str] = spotify_client_id
         self._spotify_client_secret: Optional[str] = spotify_client_secret
         self._spotify_client: Optional[spotify.Client] = None
@@ -130,10 +315,75 @@ class Node:
 
 
     @property
-    def stats(self) -> NodeStats:
+    def stats(self) -> Optional[NodeStats]:
         """Property which returns the node stats."""
         return self._stats
 
+    @property
+    def penalty(self) -> float:
+        """Property which returns the load penalty of the node, lower is better.
+           Combines the last stats frame with the players assigned since then and the REST latency.
+        """
+        penalty = self._stats.penalty if self._stats else 0.0
+
+        # Stats frames arrive once a minute, count players assigned to the node in the meantime.
+        if self._stats:
+            penalty += max(len(self._players) - (self._stats.players_total or 0), 0)
+        else:
+            penalty += len(self._players)
+
+        if self._latency is not None:
+            penalty += self._latency / LATENCY_PENALTY_STEP
+
+        return penalty
+
+    @property
+    def error_rate(self) -> float:
+        """Property which returns the share of the last REST calls that failed."""
+        if not self._rest_results:
+            return 0.0
+        return self._rest_results.count(False) / len(self._rest_results)
+
+    @property
+    def is_resuming(self) -> bool:
+        """Property which returns whether the node is disconnected but its session can still be resumed."""
+        if self._disconnected_at is None or self.is_connected:
+            return False
+        return time.monotonic() - self._disconnected_at < self._resume_timeout
+
+    @property
+    def is_degraded(self) -> bool:
+        """Property which returns whether players should be moved off this node.
+           A node is degraded when it is disconnected past its resume window, failing REST calls,
+           out of CPU or memory, or losing audio frames.
+        """
+        if not self.is_connected or not self._available:
+            # Lavalink keeps the players playing until the resume window expires.
+            return not self.is_resuming
+
+        if len(self._rest_results) >= 10 and self.error_rate >= DEGRADED_ERROR_RATE:
+            return True
+
+        if stats := self._stats:
+            if (stats.cpu_system_load or 0) >= DEGRADED_CPU_LOAD or stats.memory_usage >= DEGRADED_MEMORY_USAGE:
+                return True
+
+            # Frame stats are per player per minute, a healthy player sends 3000 frames.
+            if (stats.frames_nulled + stats.frames_deficit) / 3000 >= DEGRADED_FRAME_LOSS:
+                return True
+
+        return False
+
+    @property
+    def http_pool(self) -> ConnectionPoolStats:
+        """Property which returns the connection pool stats of this node's REST session."""
+        return self._pool_stats
+
+    @property
+    def dispatcher(self) -> OrderedDispatcher:
+        """Property which returns the dispatcher handling this node's websocket payloads."""
+        return self._dispatcher
+
     @property
     def players(self) -> Dict[int, Player]:
         """Property which returns a dict containing the guild ID and the player object."""
@@ -156,8 +406,57 @@ class Node:
 
     @property
     def latency(self) -> float:
-        """Property which returns the latency of the node"""
-        return Ping(self._host, port=self._port).get_ping()
+        """Property which returns the latency of the node in milliseconds.
+           The value is measured passively from REST calls and never blocks,
+           a node without any sample yet reports an infinite latency.
+        """
+        if time.monotonic() - self._latency_updated > LATENCY_MAX_AGE:
+            if not self._latency_probe or self._latency_probe.done():
+                self._latency_probe = self._bot.loop.create_task(self._probe_latency())
+
+        return self._latency if self._latency is not None else float("inf")
+
+    def _record_latency(self, started: float) -> None:
+        sample = (time.perf_counter() - started) * 1000
+        if self._latency is None:
+            self._latency = sample
+        else:
+            self._latency += LATENCY_SMOOTHING * (sample - self._latency)
+
+        self._latency_updated = time.monotonic()
+
+    @asynccontextmanager
+    async def _rest_request(self, method: str, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Sends a request to the REST api of the node, recording its latency and outcome.
+           Timeouts and connection errors count as failed requests, like server errors.
+        """
+        started = time.perf_counter()
+        ok: Optional[bool] = None
+        try:
+            async with self._session.request(
+                method, url, headers=self._rest_headers, timeout=self._timeout, **kwargs
+            ) as resp:
+                self._record_latency(started)
+                ok = resp.status < 500
+                yield resp
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+            raise
+        finally:
+            if ok is not None:
+                self._rest_results.append(ok)
+
+    async def _probe_latency(self) -> None:
+        started = time.perf_counter()
+        try:
+            async with self._session.get(
+                f"{self._rest_uri}/version",
+                headers=self._rest_headers, timeout=self._timeout
+            ) as resp:
+                if resp.status == 200:
+                    self._record_latency(started)
+        except Exception:
+            pass
 
     async def _update_handler(self, data: dict) -> None:
         #await self._bot.wait_until_ready()
@@ -185,26 +484,73 @@ class Node:
                 return
 
     async def _listen(self) -> None:
-        backoff = ExponentialBackoff(base=7)    
-
         while True:
             try:
                 msg = await self._websocket.receive()
+            except asyncio.CancelledError:
+                raise
             except:
                 break
-            if msg.type == aiohttp.WSMsgType.CLOSED:
-                self._available = False
-
-                retry = backoff.delay()
-                print(f"Trying to reconnect {self._identifier} with {round(retry)}s")
-                await asyncio.sleep(retry)
-                if not self.is_connected:
-                    try:
-                        await self.connect()
-                    except:
-                        pass
-            else:
-                self._bot.loop.create_task(self._handle_payload(msg.json()))
+
+            if msg.type in WS_CLOSED_TYPES:
+                break
+
+            # Payloads of a guild are handled in order, node wide payloads share the None key.
+            data = msg.json(loads=json_loads)
+            await self._dispatcher.put(data.get("guildId"), data)
+
+        self._available = False
+        self._disconnected_at = time.monotonic()
+        await self._reconnect_websocket()
+
+    async def _reconnect_websocket(self) -> None:
+        """Reconnects the websocket until it succeeds.
+           The new connection starts its own listener, so this one ends here.
+        """
+        backoff = ExponentialBackoff(base=7)
+
+        while not self.is_connected:
+            retry = backoff.delay()
+            print(f"Trying to reconnect {self._identifier} with {round(retry)}s")
+            await asyncio.sleep(retry)
+            try:
+                await self.connect()
+            except:
+                pass
+
+    async def _handle_ready(self, data: dict) -> None:
+        """Configures resuming for the new session.
+           If Lavalink could not resume the previous session, the players are replayed.
+           A resumed session may still hold players that were moved to another node meanwhile,
+           those are destroyed.
+        """
+        self._session_id = data.get("sessionId")
+        self._disconnected_at = None
+
+        try:
+            await self._configure_resuming()
+        except:
+            pass
+
+        if data.get("resumed"):
+            try:
+                await self._destroy_orphaned_players()
+            except:
+                pass
+
+        elif self.players:
+            await self.reconnect()
+
+    async def _destroy_orphaned_players(self) -> None:
+        """Destroys the players of the session that no longer belong to this node."""
+        async with self._rest_request("GET", f"{self._rest_uri}/{NODE_VERSION}/sessions/{self._session_id}/players") as resp:
+            if resp.status >= 300:
+                raise NodeException(f"Failed to fetch the players of node '{self._identifier}'.")
+            players = await resp.json(loads=json_loads)
+
+        for player in players:
+            if int(player["guildId"]) not in self._players:
+                await self.send(method=1, guild_id=player["guildId"])
 
     async def _handle_payload(self, data: dict) -> None:
         op = data.get("op", None)
@@ -212,7 +558,7 @@ class Node:
             return
 
         if op == "ready":
-            self._session_id = data.get("sessionId")
+            return await self._handle_ready(data)
 
         if op == "stats":
             self._stats = NodeStats(data)
@@ -236,35 +582,46 @@ class Node:
         if not self._available:
             raise NodeNotAvailable(f"The node '{self._identifier}' is unavailable.")
         
-        uri: str = f"{self._rest_uri}/{NODE_VERSION}" \
-                   f"/sessions/{self._session_id}/players" \
-                   f"/{guild_id}" if guild_id else "" \
-                   f"?{query}" if query else ""
+        uri: str = f"{self._rest_uri}/{NODE_VERSION}/sessions/{self._session_id}/players"
+        if guild_id:
+            uri += f"/{guild_id}"
+        if query:
+            uri += f"?{query}"
         
-        async with self._session.request(
-            method=CALL_METHOD[method],
-            url=uri,
-            headers={"Authorization": self._password},
-            json=data
-        ) as resp:
+        async with self._rest_request(CALL_METHOD[method], uri, json=data) as resp:
             if resp.status >= 300:
                 raise NodeException(f"Getting errors from Lavalink REST api")
             
-            if method == CALL_METHOD[1]:
-                return await resp.json(content_type=None)
+            if CALL_METHOD[method] == "DELETE":
+                return await resp.json(loads=json_loads, content_type=None)
 
-            return await resp.json()
+            return await resp.json(loads=json_loads)
         
+    async def _configure_resuming(self) -> None:
+        """Asks Lavalink to keep this session alive for resume_timeout seconds after a disconnect."""
+        async with self._rest_request(
+            "PATCH", f"{self._rest_uri}/{NODE_VERSION}/sessions/{self._session_id}",
+            json={"resuming": True, "timeout": self._resume_timeout}
+        ) as resp:
+            if resp.status >= 300:
+                raise NodeException(f"Failed to configure resuming on node '{self._identifier}'.")
+
     def get_player(self, guild_id: int) -> Optional[Player]:
         """Takes a guild ID as a parameter. Returns a voicelink Player object."""
         return self._players.get(guild_id, None)
 
     async def connect(self) -> Node:
-        """Initiates a connection with a Lavalink node and adds it to the node pool."""
+        """Initiates a connection with a Lavalink node and adds it to the node pool.
+           After a disconnect, the previous session is resumed with the Session-Id header.
+        """
+
+        headers = self._headers
+        if self._session_id:
+            headers = {**headers, "Session-Id": self._session_id}
 
         try:
             self._websocket = await self._session.ws_connect(
-                self._websocket_uri, headers=self._headers, heartbeat=self._heartbeat
+                self._websocket_uri, headers=headers, heartbeat=self._heartbeat
             )
 
             self._task = self._bot.loop.create_task(self._listen())
@@ -284,9 +641,6 @@ class Node:
             raise NodeConnectionFailure(
                 f"The URI for node '{self._identifier}' is invalid."
             )
-        
-        if self.players:
-            await self.reconnect()
 
         return self
               
@@ -300,26 +654,33 @@ class Node:
         if self.spotify_client:
             await self.spotify_client.close()
 
+        self._task.cancel()
+        self._dispatcher.close()
         await self._websocket.close()
         del self._pool._nodes[self._identifier]
         self._available = False
-        self._task.cancel()
 
     async def reconnect(self) -> None:
-        await asyncio.sleep(10)
-        for player in self.players.copy().values():
-            try:
-                if player._voice_state:
-                    await player._dispatch_voice_update(player._voice_state)
+        """Replays every player on a new session.
+           Only used when Lavalink could not resume the previous session.
+        """
+        semaphore = asyncio.Semaphore(REPLAY_CONCURRENCY)
 
-                if player.current:
-                    await player.play(track=player.current, start=min(player._last_position, player.current.length))
+        async def replay(player: Player) -> None:
+            async with semaphore:
+                try:
+                    if player._voice_state:
+                        await player._dispatch_voice_update(player._voice_state)
 
-                    if player.is_paused:
-                        await player.set_pause(True)
-            except:
-                await player.teardown()
-            await asyncio.sleep(2)
+                    if player.current:
+                        await player.play(track=player.current, start=min(player._last_position, player.current.length))
+
+                        if player.is_paused:
+                            await player.set_pause(True)
+                except:
+                    await player.teardown()
+
+        await asyncio.gather(*(replay(player) for player in self.players.copy().values()))
 
     async def build_track(
         self,
@@ -329,13 +690,23 @@ class Node:
         """
         Builds a track using a valid track identifier
 
+        The identifier is decoded locally, Lavalink's decodetrack endpoint
+        is only used for track message versions the decoder does not know.
+
         You can also pass in a discord.py Context object to get a
         Context object on the track it builds.
         """
 
-        async with self._session.get(
-            f"{self._rest_uri}/" + NODE_VERSION + "/decodetrack?",
-            headers={"Authorization": self._password},
+        try:
+            data: dict = decode(identifier)
+        except (ValueError, IndexError, struct.error):
+            data = (await self._pool._inflight.do(("decodetrack", identifier), self._decode_track, identifier))["info"]
+
+        return Track(track_id=identifier, info=data, requester=requester)
+
+    async def _decode_track(self, identifier: str) -> dict:
+        async with self._rest_request(
+            "GET", f"{self._rest_uri}/" + NODE_VERSION + "/decodetrack?",
             params={"track": identifier}
         ) as resp:
             if not resp.status == 200:
@@ -343,23 +714,29 @@ class Node:
                     f"Failed to build track. Check if the identifier is correct and try again."
                 )
 
-            data: dict = await resp.json()
-            return Track(track_id=identifier, info=data, requester=requester)
+            return await resp.json(loads=json_loads)
 
     async def get_tracks(
         self,
         query: str,
         *,
         requester: Member,
-        search_type: SearchType = SearchType.ytsearch
+        search_type: SearchType = SearchType.ytsearch,
+        use_cache: bool = True,
+        stream: bool = False
     ) -> Union[List[Track], Playlist]:
         """Fetches tracks from the node's REST api to parse into Lavalink.
 
            If you passed in Spotify API credentials, you can also pass in a
            Spotify URL of a playlist, album or track and it will be parsed accordingly.
+           With stream=True a Spotify playlist only holds its first page of tracks,
+           the rest can be consumed page by page through `Playlist.pages`.
 
            You can also pass in a discord.py Context object to get a
            Context object on any track you search.
+
+           Results are served from the pool's track cache when possible,
+           pass use_cache=False to force a fresh request to Lavalink.
         """
 
         if not URL_REGEX.match(query) and not re.match(r"(?:ytm?|sc)search:.", query):
@@ -374,7 +751,13 @@ class Node:
                     "please obtain Spotify API credentials here: https://developer.spotify.com/"
                 )
 
-                spotify_results = await self.spotify_client.search(query=query)
+                if stream:
+                    # A page iterator can only be consumed once, so streamed loads are not shared.
+                    spotify_results = await self.spotify_client.search(query=query, stream=True)
+                else:
+                    spotify_results = await self._pool._inflight.do(
+                        ("spotify", query), self.spotify_client.search, query=query
+                    )
             except Exception as _:
                 raise TrackLoadError("Not able to find the provided Spotify entity, is it private?")
                 
@@ -389,30 +772,22 @@ class Node:
                     )
                 ]
 
-            tracks = [
-                Track(
-                    track_id=None,
-                    info=track.to_dict(),
-                    requester=requester,
-                    search_type=search_type,
-                    spotify_track=track,
-                ) for track in spotify_results.tracks if track.uri
-            ]
-
+            pages = getattr(spotify_results, "pages", None)
             return Playlist(
                 playlist_info={"name": spotify_results.name, "selectedTrack": 0},
-                tracks=tracks,
+                tracks=self._build_spotify_tracks(spotify_results.tracks, requester, search_type),
                 requester=requester,
                 spotify=True,
-                spotify_playlist=spotify_results
+                spotify_playlist=spotify_results,
+                pages=self._stream_spotify_pages(pages, requester, search_type) if pages else None
             )
 
         elif DISCORD_MP3_URL_REGEX.match(query):
             async with self._session.get(
                 url=f"{self._rest_uri}/" + NODE_VERSION + f"/loadtracks?identifier={quote(query)}",
-                headers={"Authorization": self._password}
+                headers=self._rest_headers, timeout=self._timeout
             ) as response:
-                data: dict = await response.json()
+                data: dict = await response.json(loads=json_loads)
 
             try:
                 track: dict = data["data"]
@@ -427,11 +802,7 @@ class Node:
                 )
             ]
         else:
-            async with self._session.get(
-                url=f"{self._rest_uri}/" + NODE_VERSION + f"/loadtracks?identifier={quote(query)}",
-                headers={"Authorization": self._password}
-            ) as response:
-                data = await response.json()
+            data = await self._load_tracks(query, use_cache=use_cache)
 
         load_type = data.get("loadType")
 
@@ -474,6 +845,50 @@ class Node:
                 )
             ]
     
+    def _build_spotify_tracks(self, spotify_tracks: List[spotify.Track], requester: Member, search_type: SearchType) -> List[Track]:
+        return [
+            Track(
+                track_id=None,
+                info=track.to_dict(),
+                requester=requester,
+                search_type=search_type,
+                spotify_track=track,
+            ) for track in spotify_tracks if track.uri
+        ]
+
+    async def _stream_spotify_pages(
+        self,
+        pages: AsyncIterator[List[spotify.Track]],
+        requester: Member,
+        search_type: SearchType
+    ) -> AsyncIterator[List[Track]]:
+        try:
+            async for page in pages:
+                yield self._build_spotify_tracks(page, requester, search_type)
+        finally:
+            await pages.aclose()
+
+    async def _load_tracks(self, query: str, *, use_cache: bool = True) -> dict:
+        """Requests loadtracks from Lavalink, going through the pool's track cache."""
+        key = _track_cache_key(query)
+        cache = self._pool._track_cache
+
+        if use_cache and (data := cache.get(key)) is not None:
+            return data
+
+        return await self._pool._inflight.do(("loadtracks", key), self._fetch_tracks, query, key)
+
+    async def _fetch_tracks(self, query: str, key: tuple) -> dict:
+        async with self._rest_request(
+            "GET", f"{self._rest_uri}/" + NODE_VERSION + f"/loadtracks?identifier={quote(query)}"
+        ) as response:
+            data: dict = await response.json(loads=json_loads)
+
+        if ttl := TRACK_CACHE_TTL.get(data.get("loadType")):
+            self._pool._track_cache.put(key, data, ttl=ttl)
+
+        return data
+
     async def spotifySearch(self, query: str, *, requester: Member) -> Optional[List[Track]]:
         try:
             if not self.spotify_client:
@@ -503,6 +918,15 @@ class NodePool:
     """
 
     _nodes: Dict[str, Node] = {}
+    _track_cache: LRUCache = LRUCache(max_size=TRACK_CACHE_SIZE)
+    _inflight: SingleFlight = SingleFlight()
+
+    # Maps a NodeAlgorithm to the key a node is ranked by, the node with the lowest key is the best.
+    strategies: Dict[NodeAlgorithm, Callable[[Node], float]] = {
+        NodeAlgorithm.by_ping: lambda node: node.latency,
+        NodeAlgorithm.by_players: lambda node: len(node.players),
+        NodeAlgorithm.by_load: lambda node: node.penalty
+    }
 
     def __repr__(self):
         return f"<Voicelink.NodePool node_count={self.node_count}>"
@@ -516,6 +940,11 @@ class NodePool:
     def node_count(self) -> Optional[Node]:
         return len(self._nodes.values())
 
+    @property
+    def track_cache(self) -> LRUCache:
+        """Property which returns the loadtracks cache shared by every node in the pool."""
+        return self._track_cache
+
     @classmethod
     def get_best_node(cls, *, algorithm: NodeAlgorithm) -> Node:
         """Fetches the best node based on an NodeAlgorithm.
@@ -530,28 +959,29 @@ class NodePool:
          Use NodeAlgorithm.by_players if you want to get the best node
          based on how players it has. This method will return a node with
          the least amount of players
+         Use NodeAlgorithm.by_load if you want to get the best node
+         based on the node's load penalty.
+         Other strategies can be added to NodePool.strategies.
         """
         available_nodes = [node for node in cls._nodes.values() if node._available]
 
         if not available_nodes:
             raise NoNodesAvailable("There are no nodes available.")
 
-        if algorithm == NodeAlgorithm.by_ping:
-            tested_nodes = {node: node.latency for node in available_nodes}
-            return min(tested_nodes, key=tested_nodes.get)
+        if not (strategy := cls.strategies.get(algorithm)):
+            raise NodeException(f"The node algorithm '{algorithm.name}' is not supported.")
 
-        elif algorithm == NodeAlgorithm.by_players:
-            tested_nodes = {node: len(node.players.keys()) for node in available_nodes}
-            return min(tested_nodes, key=tested_nodes.get)
+        return min(available_nodes, key=strategy)
 
     @classmethod
-    def get_node(cls, *, identifier: str = None) -> Node:
+    def get_node(cls, *, identifier: str = None, algorithm: NodeAlgorithm = NodeAlgorithm.by_load, exclude: Optional[Node] = None) -> Node:
         """Fetches a node from the node pool using it's identifier.
-           If no identifier is provided, it will choose a node at random.
+           If no identifier is provided, it will choose the best node using the algorithm.
+           The exclude node is never returned.
         """
 
         available_nodes = { node
-            for _, node in cls._nodes.items() if node.is_connected
+            for _, node in cls._nodes.items() if node.is_connected and node is not exclude
         }
 
         if identifier:
@@ -560,8 +990,38 @@ class NodePool:
         if not available_nodes:
             raise NoNodesAvailable("There are no nodes available.")
 
-        nodes = {node: len(node.players.keys()) for node in available_nodes}
-        return min(nodes, key=nodes.get)
+        return min(available_nodes, key=cls.strategies.get(algorithm, cls.strategies[NodeAlgorithm.by_load]))
+
+    @classmethod
+    async def rebalance(cls, *, batch_size: int = MIGRATION_BATCH_SIZE, delay: float = MIGRATION_DELAY) -> int:
+        """Migrates players off degraded nodes onto the healthy node with the lowest penalty.
+           At most batch_size players are moved per call, waiting delay seconds between each,
+           so a failing node does not move all its players onto another node at once.
+           Returns the number of migrated players.
+        """
+        healthy_nodes = [node for node in cls._nodes.values() if node.is_connected and not node.is_degraded]
+        if not healthy_nodes:
+            return 0
+
+        migrated = 0
+        for node in list(cls._nodes.values()):
+            if not node.is_degraded:
+                continue
+
+            for player in list(node.players.values()):
+                if migrated >= batch_size:
+                    return migrated
+
+                target = min(healthy_nodes, key=cls.strategies[NodeAlgorithm.by_load])
+                try:
+                    await player.change_node(target._identifier)
+                    migrated += 1
+                except Exception:
+                    pass
+
+                await asyncio.sleep(delay)
+
+        return migrated
 
     @classmethod
     async def create_node(
@@ -577,7 +1037,11 @@ class NodePool:
         spotify_client_id: Optional[str] = None,
         spotify_client_secret: Optional[str] = None,
         session: Optional[aiohttp.ClientSession] = None,
-        resume_key: Optional[str] = None,
+        resume_timeout: int = RESUME_TIMEOUT,
+        http_pool_size: int = HTTP_POOL_SIZE,
+        http_keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        http_dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        http_timeout: float = HTTP_TIMEOUT
     ) -> Node:
         """Creates a Node object to be then added into the node pool.
            For Spotify searching capabilites, pass in valid Spotify API credentials.
@@ -589,7 +1053,9 @@ class NodePool:
             pool=cls, bot=bot, host=host, port=port, password=password,
             identifier=identifier, secure=secure, heartbeat=heartbeat, spotify_client_id=spotify_client_id, 
             session=session, spotify_client_secret=spotify_client_secret,
-            resume_key=resume_key
+            resume_timeout=resume_timeout, http_pool_size=http_pool_size,
+            http_keepalive_timeout=http_keepalive_timeout, http_dns_cache_ttl=http_dns_cache_ttl,
+            http_timeout=http_timeout
         )
 
         await node.connect()
@@ -3,8 +3,9 @@ from .exceptions import QueueFull, OutofList
 from .objects import Track
 from .enums import LoopType
 
-from typing import Optional, Tuple, List, Callable
-from itertools import cycle
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, List, Callable, Union
+from itertools import cycle, groupby
+from collections import Counter
 from discord import Member
 
 class LoopTypeCycle:
@@ -29,6 +30,62 @@ class LoopTypeCycle:
     def __str__(self) -> str:
         return self.current.name.capitalize()
 
+class QueueView(Sequence):
+    """A read-only window over a part of the queue, no track is copied to build it.
+       The window is fixed when the view is created, but its tracks are read from the queue,
+       use list(view) to keep a snapshot that is not affected by later changes.
+    """
+
+    __slots__ = ("_items", "_start", "_stop")
+
+    def __init__(self, items: List[Track], start: int, stop: Optional[int] = None) -> None:
+        self._items: List[Track] = items
+        self._start: int = start
+        self._stop: Optional[int] = stop
+
+    def _bounds(self) -> Tuple[int, int]:
+        stop = len(self._items) if self._stop is None else min(self._stop, len(self._items))
+        return self._start, max(stop, self._start)
+
+    def __len__(self) -> int:
+        start, stop = self._bounds()
+        return stop - start
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Track, List[Track]]:
+        start, stop = self._bounds()
+        if isinstance(index, slice):
+            first, last, step = index.indices(stop - start)
+            return self._items[start + first:start + last:step] if step > 0 else [self._items[start + i] for i in range(first, last, step)]
+
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError("queue index out of range")
+        return self._items[start + index]
+
+    def __iter__(self) -> Iterator[Track]:
+        return map(self._items.__getitem__, range(*self._bounds()))
+
+    def __reversed__(self) -> Iterator[Track]:
+        start, stop = self._bounds()
+        return map(self._items.__getitem__, range(stop - 1, start - 1, -1))
+
+    def __repr__(self) -> str:
+        return f"<Voicelink.QueueView length={len(self)}>"
+
+class PutResult:
+    """The outcome of Queue.put_many, the tracks of the batch split by what happened to them."""
+
+    __slots__ = ("added", "duplicates", "rejected")
+
+    def __init__(self) -> None:
+        self.added: List[Track] = []
+        self.duplicates: List[Track] = []
+        self.rejected: List[Track] = []
+
+    def __repr__(self) -> str:
+        return f"<Voicelink.PutResult added={len(self.added)} duplicates={len(self.duplicates)} rejected={len(self.rejected)}>"
+
 class Queue:
     def __init__(self, size: int, allow_duplicate: bool, get_msg: Callable[[str], str]) -> None:
         self._queue: List[Track] = []
@@ -37,9 +94,30 @@ class Queue:
         self._repeat: LoopTypeCycle = LoopTypeCycle()
         self._repeat_position: int = 0
         self._allow_duplicate: bool = allow_duplicate
+        # How many times each uri is in the queue, updated by every method changing the queue.
+        self._uris: Counter = Counter()
 
         self.get_msg = get_msg
 
+    def _track_added(self, tracks: Iterable[Track]) -> None:
+        self._uris.update(track.uri for track in tracks)
+
+    def _track_removed(self, tracks: Iterable[Track]) -> None:
+        for track in tracks:
+            if (count := self._uris[track.uri]) > 1:
+                self._uris[track.uri] = count - 1
+            else:
+                del self._uris[track.uri]
+
+    def is_duplicate(self, track: Track) -> bool:
+        """Returns whether a track with the same uri is already in the queue, history included."""
+        return track.uri in self._uris
+
+    @property
+    def room(self) -> int:
+        """The number of tracks that can still be added before the queue is full."""
+        return max(self._size - self.count, 0)
+
     def get(self) -> Optional[Track]:
         track = None
         try:
@@ -61,20 +139,58 @@ class Queue:
             raise QueueFull(self.get_msg("voicelinkQueueFull").format(self._size))
 
         self._queue.append(item)
+        self._uris[item.uri] += 1
         return self.count
 
+    def put_many(self, items: Iterable[Track], *, at_front: bool = False, check_duplicate: bool = None) -> PutResult:
+        """Adds a batch of tracks, to the end of the queue or in order after the current track.
+           Duplicates of the queue or of the batch itself are skipped when check_duplicate is set,
+           by default when the queue does not allow duplicates. The queue size is checked once,
+           tracks that do not fit are rejected.
+        """
+        if check_duplicate is None:
+            check_duplicate = not self._allow_duplicate
+
+        result = PutResult()
+        if check_duplicate:
+            seen = set()
+            for track in items:
+                if track.uri in self._uris or track.uri in seen:
+                    result.duplicates.append(track)
+                else:
+                    seen.add(track.uri)
+                    result.added.append(track)
+        else:
+            result.added = list(items)
+
+        room = self.room
+        result.added, result.rejected = result.added[:room], result.added[room:]
+        if result.added:
+            if at_front:
+                self._queue[self._position:self._position] = result.added
+            else:
+                self._extend(result.added)
+            self._track_added(result.added)
+
+        return result
+
+    def _extend(self, items: List[Track]) -> None:
+        self._queue.extend(items)
+
     def put_at_front(self, item: Track) -> int:
         if self.count >= self._size:
             raise QueueFull(self.get_msg("voicelinkQueueFull").format(self._size))
 
         self._queue.insert(self._position, item)
+        self._uris[item.uri] += 1
         return 1
 
     def put_at_index(self, index: int, item: Track) -> None:
         if self.count >= self._size:
             raise QueueFull(self.get_msg("voicelinkQueueFull").format(self._size))
 
-        return self._queue.insert(self._position - 1 + index, item)
+        self._queue.insert(self._position - 1 + index, item)
+        self._uris[item.uri] += 1
 
     def skipto(self, index: int) -> None:
         if not 0 < index <= self.count:
@@ -89,18 +205,24 @@ class Queue:
             self._position -= index
 
     def history_clear(self, is_playing: bool) -> None:
-        self._queue[:self._position - 1 if is_playing else self._position] = []
+        end = self._position - 1 if is_playing else self._position
+        self._track_removed(self._queue[:end])
+        self._queue[:end] = []
         self._position = 1 if is_playing else 0
 
     def clear(self) -> None:
+        self._track_removed(self._queue[self._position:])
         del self._queue[self._position:]
 
     def replace(self, queue_type: str, replacement: list) -> None:
         if queue_type == "queue":
             self.clear()
             self._queue += replacement
+            self._track_added(replacement)
         elif queue_type == "history":
+            self._track_removed(self._queue[:self._position])
             self._queue[:self._position] = replacement
+            self._track_added(replacement)
 
     def swap(self, num1: int, num2: int) -> Tuple[Track, Track]:
         try:
@@ -115,9 +237,8 @@ class Queue:
             raise OutofList(self.get_msg("voicelinkOutofList"))
 
         try:
-            moveItem = self._queue[self._position + target - 1]
-            self._queue.remove(moveItem)
-            self.put_at_index(to, moveItem)
+            moveItem = self._queue.pop(self._position + target - 1)
+            self._queue.insert(self._position - 1 + to, moveItem)
             return moveItem
         except:
             raise OutofList(self.get_msg("voicelinkOutofList"))
@@ -132,32 +253,35 @@ class Queue:
             index, index2 = index2, index
 
         try:
-            count = []
-            for i, track in enumerate(self._queue[pos + index: pos + index2 + 1]):
-                if member:
-                    if track.requester != member:
-                        continue
-            
-                self._queue.remove(track)
-                count.append({"position": pos + index + i, "track": track})
-
+            start, stop = pos + index, pos + index2 + 1
+            count, kept = [], []
+            for i, track in enumerate(self._queue[start:stop], start=start):
+                if member and track.requester != member:
+                    kept.append(track)
+                    continue
+
+                count.append({"position": i, "track": track})
+
+            # The range is rebuilt by index, tracks are never searched or compared.
+            self._queue[start:stop] = kept
+            self._track_removed(item["track"] for item in count)
             return count
         except:
             raise OutofList(self.get_msg("voicelinkOutofList"))
 
-    def history(self, incTrack: bool = False) -> List[Track]:
+    def history(self, incTrack: bool = False) -> QueueView:
         if incTrack:
-            return self._queue[:self._position]
-        return self._queue[:self._position - 1]
+            return QueueView(self._queue, 0, self._position)
+        return QueueView(self._queue, 0, max(self._position - 1, 0))
 
-    def tracks(self, incTrack: bool = False) -> List[Track]:
+    def tracks(self, incTrack: bool = False) -> QueueView:
         if incTrack:
-            return self._queue[self._position - 1:]
-        return self._queue[self._position:]
+            return QueueView(self._queue, max(self._position - 1, 0))
+        return QueueView(self._queue, self._position)
 
     @property
     def count(self) -> int:
-        return len(self._queue[self._position:])
+        return max(len(self._queue) - self._position, 0)
     
     @property
     def repeat(self) -> str:
@@ -165,33 +289,56 @@ class Queue:
 
     @property
     def is_empty(self) -> bool:
-        try:
-            self._queue[self._position]
-        except:
-            return True
-        return False
+        return self._position >= len(self._queue)
 
 class FairQueue(Queue):
-    def __init__(self, size: int, allow_duplicate: bool, get_msg) -> None:
-        super().__init__(size, allow_duplicate, get_msg)
-        self._set = set()
+    """A queue taking turns between requesters.
+       A track is placed after the last track of its requester, then after the following
+       run of tracks from distinct requesters, so every requester gets one track per round.
+    """
 
     def put(self, item: Track) -> int:
         if len(self._queue) >= self._size:
             raise QueueFull(self.get_msg("voicelinkQueueFull").format(self._size))
 
-        tracks = self.tracks(incTrack=True)
-        lastIndex = len(tracks)
-        for track in reversed(tracks):
-            if track.requester == item.requester:
-                break
-            lastIndex -= 1
-        self._set.clear()
-        for track in tracks[lastIndex:]:
-            if track.requester in self._set:
-                break
-            lastIndex += 1
-            self._set.add(track.requester)
-
-        self.put_at_index(lastIndex, item)
-        return lastIndex
+        self._uris[item.uri] += 1
+        return self._insert_run([item])
+
+    @property
+    def room(self) -> int:
+        return max(self._size - len(self._queue), 0)
+
+    def _extend(self, items: List[Track]) -> None:
+        """Inserts the tracks in the same order as putting them one by one,
+           with one pass over the queue per run of tracks from the same requester.
+        """
+        for _, run in groupby(items, key=lambda track: track.requester):
+            self._insert_run(list(run))
+
+    def _insert_run(self, items: List[Track]) -> int:
+        """Inserts tracks of a single requester and returns the position of the first one,
+           counted from the current track like put_at_index.
+        """
+        queue, base = self._queue, max(self._position - 1, 0)
+        requester = items[0].requester
+
+        start = len(queue)
+        while start > base and queue[start - 1].requester != requester:
+            start -= 1
+
+        # Every inserted track becomes the requester's last one, so the next track of
+        # the run carries on scanning from there and the queue is walked only once.
+        index, merged, first = start, [], None
+        for item in items:
+            seen = set()
+            while index < len(queue) and queue[index].requester not in seen:
+                seen.add(queue[index].requester)
+                merged.append(queue[index])
+                index += 1
+
+            if first is None:
+                first = index - base
+            merged.append(item)
+
+        queue[start:index] = merged
+        return first
@@ -23,20 +23,45 @@ SOFTWARE.
 
 import re
 import time
+import asyncio
 import aiohttp
 
 from base64 import b64encode
-from typing import List, Union
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from ..utils import LRUCache, json_dumps, json_loads
 from .objects import Track, Album, Artist, Playlist
 from .exceptions import InvalidSpotifyURL, SpotifyRequestException 
 
 GRANT_URL = "https://accounts.spotify.com/api/token"
 REQUEST_URL = "https://api.spotify.com/v1/{type}s/{id}"
 SEARCH_URL = "https://api.spotify.com/v1/search?q={query}&type={type}&limit={limit}"
+PLAYLIST_TRACKS_URL = "https://api.spotify.com/v1/playlists/{id}/tracks?offset={offset}&limit={limit}"
 SUGGESTION_URL = "https://api.spotify.com/v1/recommendations?limit={limit}&seed_tracks={seed_tracks}"
 SPOTIFY_URL_REGEX = re.compile(
     r"https?://open.spotify.com/(?P<type>album|playlist|track|artist)/(?P<id>[a-zA-Z0-9]+)"
 )
+MAX_AGE_REGEX = re.compile(r"max-age=(?P<age>\d+)")
+
+CACHE_SIZE = 512
+CACHE_TTL = 3600
+
+MAX_TRACKS = 1000
+PAGE_CONCURRENCY = 5
+
+def _parse_cache_control(value: Optional[str]) -> Optional[int]:
+    """Returns how many seconds a response may be served without revalidation, None if it must not be stored."""
+    if not value:
+        return 0
+
+    value = value.lower()
+    if "no-store" in value:
+        return None
+
+    if "no-cache" in value:
+        return 0
+
+    match = MAX_AGE_REGEX.search(value)
+    return int(match.group("age")) if match else 0
 
 class Client:
     """The base client for the Spotify module of Voicelink.
@@ -44,11 +69,28 @@ class Client:
        for any Spotify URL you throw at it.
     """
 
-    def __init__(self, client_id: str, client_secret: str) -> None:
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        *,
+        cache_size: int = CACHE_SIZE,
+        cache_ttl: float = CACHE_TTL,
+        max_tracks: int = MAX_TRACKS,
+        page_concurrency: int = PAGE_CONCURRENCY
+    ) -> None:
         self._client_id = client_id
         self._client_secret = client_secret
 
-        self.session = aiohttp.ClientSession()
+        # Caps how many playlist tracks are loaded and how many pages are fetched at once.
+        self._max_tracks: int = max_tracks
+        self._page_concurrency: int = page_concurrency
+
+        self.session = aiohttp.ClientSession(json_serialize=json_dumps)
+
+        # Responses are kept for cache_ttl seconds so they can be revalidated with their ETag,
+        # but are only served without a request while fresh according to Cache-Control.
+        self._cache: LRUCache = LRUCache(max_size=cache_size, ttl=cache_ttl)
 
         self._bearer_token: str = None
         self._expiry = 0
@@ -65,66 +107,81 @@ class Client:
                     f"Error fetching bearer token: {resp.status} {resp.reason}"
                 )
 
-            data: dict = await resp.json()
+            data: dict = await resp.json(loads=json_loads)
 
         self._bearer_token = data["access_token"]
         self._expiry = time.time() + (int(data["expires_in"]) - 10)
         self._bearer_headers = {"Authorization": f"Bearer {self._bearer_token}"}
 
-    async def trackSearch(self, query: str, track: str = "track", limit: int = 10) -> List[Track]:
+    @property
+    def cache(self) -> LRUCache:
+        return self._cache
+
+    async def _request(self, url: str) -> dict:
+        """Sends a GET request to the Web API, serving fresh responses from the cache
+           and revalidating stale ones with If-None-Match.
+        """
         if not self._bearer_token or time.time() >= self._expiry:
             await self._fetch_bearer_token()
 
-        request_url = SEARCH_URL.format(query=query, type=track, limit=limit)
+        entry: Optional[Tuple[float, Optional[str], dict]] = self._cache.get(url)
+        if entry and entry[0] > time.time():
+            return entry[2]
 
-        async with self.session.get(request_url, headers=self._bearer_headers) as resp:
-            if resp.status != 200:
+        headers = self._bearer_headers
+        if entry and entry[1]:
+            headers = {**headers, "If-None-Match": entry[1]}
+
+        async with self.session.get(url, headers=headers) as resp:
+            max_age = _parse_cache_control(resp.headers.get("Cache-Control"))
+
+            if resp.status == 304 and entry:
+                data = entry[2]
+            elif resp.status != 200:
                 raise SpotifyRequestException(
                     f"Error while fetching results: {resp.status} {resp.reason}"
                 )
-            
-            data: dict = await resp.json()
+            else:
+                data: dict = await resp.json(loads=json_loads)
+
+            etag = resp.headers.get("ETag") or (entry[1] if entry else None)
+
+        if max_age is None:
+            self._cache.pop(url)
+        elif etag or max_age:
+            self._cache.put(url, (time.time() + max_age, etag, data))
+
+        return data
+
+    async def trackSearch(self, query: str, track: str = "track", limit: int = 10) -> List[Track]:
+        request_url = SEARCH_URL.format(query=query, type=track, limit=limit)
+        data: dict = await self._request(request_url)
 
         return [ Track(track) for track in data['tracks']['items'] ]
 
     async def similar_track(self, seed_tracks: str, *, limit: int = 5) -> List[Track]:
-        if not self._bearer_token or time.time() >= self._expiry:
-            await self._fetch_bearer_token()
-        
         request_url = SUGGESTION_URL.format(limit=limit, seed_tracks=seed_tracks)
+        data: dict = await self._request(request_url)
 
-        async with self.session.get(request_url, headers=self._bearer_headers) as resp:
-            if resp.status != 200:
-                raise SpotifyRequestException(
-                    f"Error while fetching results: {resp.status} {resp.reason}"
-                )
-            
-            data: dict = await resp.json()
-
-            return [ Track(track) for track in data['tracks'] ]
+        return [ Track(track) for track in data['tracks'] ]
             
-    async def search(self, *, query: str) -> Union[Track, Album, Playlist]:
-        if not self._bearer_token or time.time() >= self._expiry:
-            await self._fetch_bearer_token()
-
+    async def search(self, *, query: str, stream: bool = False) -> Union[Track, Album, Playlist]:
+        """Loads a Spotify track, album, artist or playlist from its URL.
+           With stream=True only the first page of a playlist is loaded,
+           the remaining pages are available through `Playlist.pages`.
+        """
         result = SPOTIFY_URL_REGEX.match(query)
-        spotify_type = result.group("type")
-        spotify_id = result.group("id")
-
         if not result:
             raise InvalidSpotifyURL("The Spotify link provided is not valid.")
 
+        spotify_type = result.group("type")
+        spotify_id = result.group("id")
+
         request_url = REQUEST_URL.format(type=spotify_type, id=spotify_id)
         if isArtist := (spotify_type == "artist"):
             request_url += "/top-tracks?market=US"
 
-        async with self.session.get(request_url, headers=self._bearer_headers) as resp:
-            if resp.status != 200:
-                raise SpotifyRequestException(
-                    f"Error while fetching results: {resp.status} {resp.reason}"
-                )
-
-            data: dict = await resp.json()
+        data: dict = await self._request(request_url)
 
         if spotify_type == "track":
             return Track(data)
@@ -136,29 +193,49 @@ class Client:
             tracks = [
                 Track(track["track"])
                 for track in data["tracks"]["items"] if track["track"] is not None
-            ]
+            ][:self._max_tracks]
 
             if not tracks:
                 raise SpotifyRequestException("This playlist is empty and therefore cannot be queued.")
-                
-            next_page_url = data["tracks"]["next"]
 
-            while next_page_url is not None:
-                async with self.session.get(next_page_url, headers=self._bearer_headers) as resp:
-                    if resp.status != 200:
-                        raise SpotifyRequestException(
-                            f"Error while fetching results: {resp.status} {resp.reason}"
-                        )
+            pages = None
+            if min(data["tracks"]["total"], self._max_tracks) > data["tracks"]["limit"]:
+                pages = self._iter_playlist_pages(spotify_id, data["tracks"], loaded=len(tracks))
 
-                    next_data: dict = await resp.json()
+            if pages and not stream:
+                async for page in pages:
+                    tracks += page
+                pages = None
 
-                tracks += [
+            return Playlist(data, tracks, pages, loadable_tracks=min(data["tracks"]["total"], self._max_tracks))
+    
+    async def _iter_playlist_pages(self, spotify_id: str, first_page: dict, *, loaded: int = 0) -> AsyncIterator[List[Track]]:
+        """Yields the remaining pages of a playlist in order while fetching them concurrently.
+           The offsets are computed from the first page's total and limit,
+           pending requests are cancelled once the iterator is closed.
+        """
+        limit: int = first_page["limit"]
+        total: int = min(first_page["total"], self._max_tracks)
+        semaphore = asyncio.Semaphore(self._page_concurrency)
+
+        async def fetch(offset: int) -> dict:
+            async with semaphore:
+                return await self._request(PLAYLIST_TRACKS_URL.format(id=spotify_id, offset=offset, limit=limit))
+
+        tasks = [asyncio.ensure_future(fetch(offset)) for offset in range(limit, total, limit)]
+        try:
+            for task in tasks:
+                page = await task
+                tracks = [
                     Track(track["track"])
-                    for track in next_data["items"] if track["track"] is not None
-                ]
-                next_page_url = next_data["next"]
+                    for track in page["items"] if track["track"] is not None
+                ][:self._max_tracks - loaded]
+
+                loaded += len(tracks)
+                yield tracks
+        finally:
+            for task in tasks:
+                task.cancel()
 
-            return Playlist(data, tracks)
-    
     async def close(self) -> None:
         await self.session.close()
@@ -1,3 +1,5 @@
+from typing import AsyncIterator, Optional
+
 class Track:
     """The base class for a Spotify Track"""
 
@@ -8,7 +10,8 @@ class Track:
         "length",
         "id",
         "image",
-        "uri"
+        "uri",
+        "isrc"
     )
 
     def __init__(self, data: dict, image = None) -> None:
@@ -19,6 +22,7 @@ class Track:
         self.id: str = data.get('id')
         self.image: str = images[0]["url"] if (images := data.get("album", {}).get("images")) else image
         self.uri: str = None if data["is_local"] else data["external_urls"]["spotify"]
+        self.isrc: Optional[str] = data.get("external_ids", {}).get("isrc")
 
     def to_dict(self) -> dict:
         return {
@@ -31,7 +35,8 @@ class Track:
             "isStream": False,
             "isSeekable": True,
             "position": 0,
-            "artworkUrl": self.image
+            "artworkUrl": self.image,
+            "isrc": self.isrc
         }
     
     def __repr__(self) -> str:
@@ -104,16 +109,28 @@ class Playlist:
         "tracks",
         "owner",
         "total_tracks",
+        "loadable_tracks",
         "id",
         "image",
-        "uri"
+        "uri",
+        "pages"
     )
     
-    def __init__(self, data: dict, tracks: list[Track]) -> None:
+    def __init__(
+        self,
+        data: dict,
+        tracks: list[Track],
+        pages: Optional[AsyncIterator[list[Track]]] = None,
+        *,
+        loadable_tracks: Optional[int] = None
+    ) -> None:
         self.name: str = data.get('name', 'Unknown')
         self.tracks: list[Track] = tracks
+        self.pages: Optional[AsyncIterator[list[Track]]] = pages
         self.owner: str = data["owner"]["display_name"]
         self.total_tracks: int = data["tracks"]["total"]
+        # How many tracks the client loads in total, total_tracks capped by its max_tracks.
+        self.loadable_tracks: int = self.total_tracks if loadable_tracks is None else loadable_tracks
         self.id: str = data.get('id')
         self.image: str = data["images"][0]["url"] if len(data.get("images", [])) else None
         self.uri: str = data["external_urls"]["spotify"]
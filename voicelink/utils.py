@@ -1,15 +1,49 @@
 
+import json
 import random
 import time
-import socket
-from timeit import default_timer as timer
-from itertools import zip_longest
+import aiohttp
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple, Union
 
 __all__ = [
     "ExponentialBackoff",
-    "NodeStats"
+    "NodeStats",
+    "LRUCache",
+    "ConnectionPoolStats",
+    "JSON_BACKEND",
+    "json_loads",
+    "json_dumps"
 ]
 
+# Lavalink frames, REST responses and json files are parsed with the fastest installed library.
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+
+    def json_loads(data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    def json_dumps(data: Any) -> str:
+        return orjson.dumps(data).decode("utf-8")
+
+except ImportError:
+    try:
+        import ujson
+
+        JSON_BACKEND = "ujson"
+        json_loads = ujson.loads
+
+        def json_dumps(data: Any) -> str:
+            return ujson.dumps(data, ensure_ascii=False)
+
+    except ImportError:
+        JSON_BACKEND = "json"
+        json_loads = json.loads
+        json_dumps = json.dumps
+
+
 class ExponentialBackoff:
     def __init__(self, base: int = 1, *, integral: bool = False) -> None:
 
@@ -38,6 +72,76 @@ class ExponentialBackoff:
         return self._randfunc(0, self._base * 2 ** self._exp)
 
 
+class LRUCache:
+    """A bounded least-recently-used cache with a per-entry time to live.
+       Entries are evicted once they expire or when the cache grows past `max_size`.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300) -> None:
+        self._data: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._max_size: int = max_size
+        self._ttl: float = ttl
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"<Voicelink.LRUCache size={len(self._data)} hits={self.hits} misses={self.misses}>"
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self._ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4)
+        }
+
+
 class NodeStats:
     """The base class for the node stats object.
        Gives critical information on the node, which is updated every minute.
@@ -60,70 +164,85 @@ class NodeStats:
         self.players_total = data.get("players")
         self.uptime = data.get("uptime")
 
+        # Frame stats are only sent by Lavalink once it has players, per minute of audio.
+        frames: dict = data.get("frameStats") or {}
+        self.frames_sent = frames.get("sent", 0)
+        self.frames_nulled = frames.get("nulled", 0)
+        self.frames_deficit = frames.get("deficit", 0)
+
+    @property
+    def memory_usage(self) -> float:
+        """The share of reservable memory that is in use, from 0 to 1."""
+        return self.used / self.reservable if self.reservable else 0.0
+
+    @property
+    def penalty(self) -> float:
+        """A load score of the node, the higher it is the more loaded the node is.
+           Based on the penalties used by the Lavalink clients, with an extra memory penalty.
+        """
+        cpu_penalty = 1.05 ** (100 * (self.cpu_system_load or 0)) * 10 - 10
+        deficit_penalty = 1.03 ** (500 * (self.frames_deficit / 3000)) * 600 - 600
+        nulled_penalty = (1.03 ** (500 * (self.frames_nulled / 3000)) * 300 - 300) * 2
+        # The JVM usually keeps a good part of its heap in use, only penalize once headroom gets short.
+        memory_penalty = 1.1 ** (100 * max(self.memory_usage - 0.7, 0)) * 10 - 10
+        idle_penalty = ((self.players_total or 0) - (self.players_active or 0)) * 0.25
+
+        return (self.players_active or 0) + idle_penalty + cpu_penalty + deficit_penalty + nulled_penalty + memory_penalty
+
     def __repr__(self) -> str:
         return f"<Voicelink.NodeStats total_players={self.players_total!r} playing_active={self.players_active!r}>"
 
 
-class Ping:
-    # Thanks to https://github.com/zhengxiaowai/tcping for the nice ping impl
-    def __init__(self, host, port, timeout=5):
-        self.timer = self.Timer()
-
-        self._successed = 0
-        self._failed = 0
-        self._conn_time = None
-        self._host = host
-        self._port = port
-        self._timeout = timeout
-
-    class Socket(object):
-        def __init__(self, family, type_, timeout):
-            s = socket.socket(family, type_)
-            s.settimeout(timeout)
-            self._s = s
-
-        def connect(self, host, port):
-            self._s.connect((host, int(port)))
-
-        def shutdown(self):
-            self._s.shutdown(socket.SHUT_RD)
-
-        def close(self):
-            self._s.close()
-
-
-    class Timer(object):
-        def __init__(self):
-            self._start = 0
-            self._stop = 0
-
-        def start(self):
-            self._start = timer()
-
-        def stop(self):
-            self._stop = timer()
-
-        def cost(self, funcs, args):
-            self.start()
-            for func, arg in zip_longest(funcs, args):
-                if arg:
-                    func(*arg)
-                else:
-                    func()
-
-            self.stop()
-            return self._stop - self._start
-
-    def _create_socket(self, family, type_):
-        return self.Socket(family, type_, self._timeout)
-
-    def get_ping(self):
-        s = self._create_socket(socket.AF_INET, socket.SOCK_STREAM)
-     
-        cost_time = self.timer.cost(
-            (s.connect, s.shutdown),
-            ((self._host, self._port), None))
-        s_runtime = 1000 * (cost_time)
+class ConnectionPoolStats:
+    """Tracks how an aiohttp connection pool is used.
+       Connection counts are read from the connector, the time requests wait
+       for a free connection is recorded through the trace config.
+    """
 
-        return s_runtime
+    def __init__(self) -> None:
+        self.connector: Optional[aiohttp.BaseConnector] = None
+        self.waiting: int = 0
+        self.waits: int = 0
+        self.wait_total: float = 0.0
+        self.wait_max: float = 0.0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_queued_start.append(self._on_queued_start)
+        trace_config.on_connection_queued_end.append(self._on_queued_end)
+        return trace_config
+
+    async def _on_queued_start(self, session, context, params) -> None:
+        context.queued_at = time.perf_counter()
+        self.waiting += 1
+
+    async def _on_queued_end(self, session, context, params) -> None:
+        waited = time.perf_counter() - context.queued_at
+        self.waiting -= 1
+        self.waits += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    @property
+    def in_use(self) -> int:
+        """The number of connections currently serving a request."""
+        return len(getattr(self.connector, "_acquired", ()))
+
+    @property
+    def idle(self) -> int:
+        """The number of open connections kept alive for reuse."""
+        return sum(len(conns) for conns in getattr(self.connector, "_conns", {}).values())
+
+    def stats(self) -> dict:
+        return {
+            "in_use": self.in_use,
+            "idle": self.idle,
+            "limit_per_host": getattr(self.connector, "limit_per_host", None),
+            "waiting": self.waiting,
+            "waits": self.waits,
+            "avg_wait": self.wait_total / self.waits if self.waits else 0.0,
+            "max_wait": self.wait_max
+        }
 
+    def __repr__(self) -> str:
+        return f"<Voicelink.ConnectionPoolStats in_use={self.in_use} idle={self.idle} waiting={self.waiting}>"